@@ -1,10 +1,16 @@
 # app.py - точка входа для Render
-import eventlet
-eventlet.monkey_patch()
+import os
 
-from web_messenger import create_app, socketio
+# monkey_patch должен выполниться до импорта приложения; бэкенд задается ASYNC_MODE
+ASYNC_MODE = os.environ.get('ASYNC_MODE', 'eventlet')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
 
-app = create_app()
+from web_messenger import app, socketio
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,166 @@
+# cache.py - кэши в памяти процесса для AURA Messenger
+import bisect
+import time
+from collections import OrderedDict
+
+from concurrency import original
+
+
+class LRUCache:
+    # Ограниченный по размеру кэш с вытеснением давно неиспользуемых записей и TTL.
+    # Блокировка настоящая (не зеленая): кэш читают и гринлеты, и потоки tpool.
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = original('threading').Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class ProfileCache(LRUCache):
+    # Профили пользователей: промах загружается через loader, None не кэшируется
+    def __init__(self, loader, maxsize=10000, ttl=300):
+        super().__init__(maxsize, ttl)
+        self.loader = loader
+
+    def get(self, username):
+        profile = super().get(username)
+        if profile is None:
+            profile = self.loader(username)
+            if profile is not None:
+                self.put(username, profile)
+        return profile
+
+
+class RecentMessages:
+    # Кольцевой буфер последних сообщений для активных комнат.
+    # Комнаты загружаются при первом обращении, холодные вытесняются по LRU.
+    def __init__(self, loader, capacity=200, max_rooms=500):
+        self.loader = loader
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self.hits = 0
+        self.misses = 0
+        self._rooms = OrderedDict()  # room -> [список сообщений по возрастанию id, complete]
+        self._loading = {}  # room -> сообщения, пришедшие во время загрузки
+        self._lock = original('threading').Lock()
+
+    def _insert(self, buffer, message):
+        messages = buffer[0]
+        if messages and messages[-1]['id'] >= message['id']:
+            # Сообщения могут прийти не по порядку id - вставляем на место, без дублей
+            ids = [m['id'] for m in messages]
+            index = bisect.bisect_left(ids, message['id'])
+            if index < len(ids) and ids[index] == message['id']:
+                return
+            if index == 0 and not buffer[1] and len(messages) >= self.capacity:
+                return
+            messages.insert(index, message)
+        else:
+            messages.append(message)
+        if len(messages) > self.capacity:
+            del messages[0]
+            buffer[1] = False
+
+    def _load(self, room):
+        with self._lock:
+            self._loading.setdefault(room, [])
+        try:
+            messages = self.loader(room, self.capacity)
+        except Exception:
+            with self._lock:
+                self._loading.pop(room, None)
+            raise
+        with self._lock:
+            buffer = [list(messages), len(messages) < self.capacity]
+            for message in self._loading.pop(room, []):
+                self._insert(buffer, message)
+            self._rooms[room] = buffer
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+            return buffer
+
+    def page(self, room, limit, before_id=None):
+        # Возвращает страницу истории или None, если буфер не покрывает запрошенное окно
+        if not self.capacity:
+            return None
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is not None:
+                self._rooms.move_to_end(room)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if buffer is None:
+            buffer = self._load(room)
+        with self._lock:
+            messages, complete = buffer
+            if before_id is not None:
+                ids = [m['id'] for m in messages]
+                messages = messages[:bisect.bisect_left(ids, before_id)]
+            if len(messages) >= limit:
+                return messages[-limit:]
+            return list(messages) if complete else None
+
+    def append(self, room, message):
+        with self._lock:
+            if room in self._loading:
+                self._loading[room].append(message)
+            buffer = self._rooms.get(room)
+            if buffer is not None:
+                self._insert(buffer, message)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rooms': len(self._rooms),
+                'max_rooms': self.max_rooms,
+                'capacity': self.capacity,
+                'messages': sum(len(b[0]) for b in self._rooms.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,54 @@
+# concurrency.py - выбор асинхронного бэкенда и вынос блокирующих вызовов в пул потоков ОС
+import functools
+import importlib
+import sys
+
+ASYNC_MODES = ('eventlet', 'gevent', 'threading')
+
+_async_mode = 'threading'
+
+
+def detect_async_mode():
+    # Бэкенд определяется по тому, чей monkey_patch уже применен (app.py, воркер gunicorn)
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('socket'):
+            return 'eventlet'
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('socket'):
+            return 'gevent'
+    return 'threading'
+
+
+def configure(async_mode=None):
+    global _async_mode
+    _async_mode = async_mode if async_mode in ASYNC_MODES else detect_async_mode()
+    return _async_mode
+
+
+def offloading():
+    # SQLite и файловый ввод-вывод не кооперативны: под eventlet они уходят в tpool
+    return _async_mode == 'eventlet'
+
+
+def original(module_name):
+    # Модуль стандартной библиотеки без зеленых патчей - для кода, работающего в потоках tpool
+    if offloading():
+        from eventlet import patcher
+        return patcher.original(module_name)
+    return importlib.import_module(module_name)
+
+
+def run_blocking(fn, *args, **kwargs):
+    if offloading():
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+def blocking(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return run_blocking(fn, *args, **kwargs)
+    return wrapper
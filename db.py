@@ -0,0 +1,377 @@
+# db.py - пул соединений с базой данных AURA Messenger (SQLite или PostgreSQL)
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from concurrency import original, run_blocking
+
+DEFAULT_PATH = 'messenger.db'
+
+# PRAGMA, которые применяются к каждому новому соединению пула
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Режим WAL: читатели не блокируют писателя, fsync только на чекпоинтах
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16000,  # ~16MB страниц на соединение
+}
+
+
+def parse_pragmas(value):
+    # Формат переменной окружения: "cache_size=-16000;temp_store=MEMORY"
+    pragmas = {}
+    for item in (value or '').split(';'):
+        if '=' in item:
+            name, val = item.split('=', 1)
+            pragmas[name.strip()] = val.strip()
+    return pragmas
+
+
+class Database:
+    dialect = 'sqlite'
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path=DEFAULT_PATH, pool_size=8, timeout=30, cached_statements=256, pragmas=None,
+                 wal=True, write_queue=True, batch_size=256, batch_delay=0.002):
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if wal:
+            self.pragmas.update(WAL_PRAGMAS)
+        self.pragmas.update(pragmas or {})
+        # Соединения используются из потоков ОС (tpool), поэтому и примитивы нужны настоящие
+        self.threading = original('threading')
+        self.queue = original('queue')
+        self.writer = Writer(self, batch_size, batch_delay) if write_queue else None
+        self._lock = self.threading.Lock()
+        self._reset_pool()
+
+    def _reset_pool(self):
+        # После fork соединения родителя использовать нельзя - начинаем с пустого пула
+        self._pid = os.getpid()
+        self._idle = self.queue.LifoQueue()
+        self._created = 0
+        self._local = self.threading.local()
+
+    def _connect(self):
+        # check_same_thread=False: соединение переходит между потоками/гринлетами,
+        # но в каждый момент принадлежит только одному из них
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _acquire(self):
+        if self._pid != os.getpid():
+            self._reset_pool()
+        try:
+            return self._idle.get_nowait()
+        except self.queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get(timeout=self.timeout)
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, conn):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            # Вложенный вызов в том же потоке переиспользует уже выданное соединение
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def write(self, fn, *args):
+        # Все записи идут через одного писателя, который объединяет их в групповые коммиты
+        return run_blocking(self._write, fn, *args)
+
+    def _write(self, fn, *args):
+        if self.writer is None:
+            with self.connection() as conn:
+                return fn(conn, *args)
+        return self.writer.submit(fn, *args)
+
+    def execute_write(self, sql, params=()):
+        return self.write(lambda conn: conn.execute(sql, params))
+
+    def insert(self, cursor, sql, params=()):
+        # INSERT с возвратом id новой строки (None, если строка не вставлена)
+        cursor.execute(sql, params)
+        return cursor.lastrowid if cursor.rowcount > 0 else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.stop()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except self.queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class _WriteJob:
+    __slots__ = ('fn', 'args', 'result', 'error', 'done')
+
+    def __init__(self, fn, args, done):
+        self.fn = fn
+        self.args = args
+        self.result = None
+        self.error = None
+        self.done = done
+
+
+class Writer:
+    def __init__(self, db, batch_size=256, batch_delay=0.002):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue = db.queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = db.threading.Lock()
+
+    def _ensure_started(self):
+        # Поток писателя запускается лениво и заново в каждом дочернем процессе
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = self.db.queue.Queue()
+                self._thread = self.db.threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args):
+        self._ensure_started()
+        job = _WriteJob(fn, args, self.db.threading.Event())
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stop(self):
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(self.db.timeout)
+        self._thread = None
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except self.db.queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _commit(self, conn, batch):
+        # Каждая запись в своей точке сохранения: ошибка одной не откатывает остальные
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for job in batch:
+                conn.execute('SAVEPOINT job')
+                try:
+                    job.result = job.fn(conn, *job.args)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    job.error = e
+                conn.execute('RELEASE job')
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for job in batch:
+                job.result, job.error = None, e
+
+    def _fail_pending(self, error):
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except self.db.queue.Empty:
+                break
+            if job is not None:
+                job.error = error
+                job.done.set()
+
+    def _run(self):
+        try:
+            conn = self.db._connect()
+            conn.isolation_level = None
+        except Exception as e:
+            self._thread = None
+            self._fail_pending(e)
+            return
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    break
+                batch = self._collect(job)
+                self._commit(conn, batch)
+                for job in batch:
+                    job.done.set()
+        finally:
+            conn.close()
+
+
+# === PostgreSQL ===
+# Репозитории пишут SQL в диалекте SQLite; для PostgreSQL он переводится здесь,
+# чтобы миграции и запросы существовали в одном экземпляре.
+_PG_REWRITES = [
+    (re.compile(r'INTEGER PRIMARY KEY AUTOINCREMENT', re.I), 'BIGSERIAL PRIMARY KEY'),
+    (re.compile(r'\bLIKE\b', re.I), 'ILIKE'),
+]
+
+
+def translate_sql(sql):
+    ignore = re.search(r'INSERT\s+OR\s+IGNORE\s+INTO', sql, re.I)
+    if ignore:
+        sql = sql[:ignore.start()] + 'INSERT INTO' + sql[ignore.end():]
+        sql = sql.rstrip().rstrip(';') + ' ON CONFLICT DO NOTHING'
+    for pattern, replacement in _PG_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+class PgCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(translate_sql(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate_sql(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return getattr(self, '_lastrowid', None)
+
+
+class PgConnection:
+    # Обертка psycopg2 с интерфейсом sqlite3.Connection, которым пользуются репозитории
+    dialect = 'postgres'
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return PgCursor(self._conn.cursor())
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        return False
+
+
+class PostgresDatabase(Database):
+    # Тот же пул, но без писателя: PostgreSQL сам справляется с конкурентной записью
+    dialect = 'postgres'
+
+    def __init__(self, dsn, pool_size=8, timeout=30):
+        try:
+            import psycopg2
+        except ImportError:
+            raise RuntimeError('Для DATABASE_URL=postgres://... установите пакет psycopg2-binary')
+        self.psycopg2 = psycopg2
+        self.IntegrityError = psycopg2.IntegrityError
+        super().__init__(dsn, pool_size=pool_size, timeout=timeout, wal=False, write_queue=False)
+
+    def _connect(self):
+        return PgConnection(self.psycopg2.connect(self.path, connect_timeout=self.timeout))
+
+    def insert(self, cursor, sql, params=()):
+        cursor.execute(sql + ' RETURNING id', params)
+        row = cursor.fetchone()
+        cursor._lastrowid = row[0] if row else None
+        return cursor._lastrowid
+
+
+def create_database(app):
+    url = app.config['DATABASE_URL']
+    if url and url.startswith(('postgres://', 'postgresql://')):
+        db = PostgresDatabase(url, pool_size=app.config['DB_POOL_SIZE'])
+        app.extensions['db'] = db
+        return db
+    # sqlite:///path - тот же движок, что и DATABASE, но заданный URL-ом
+    path = url[len('sqlite:///'):] if url and url.startswith('sqlite:///') else app.config['DATABASE']
+    db = Database(
+        path,
+        pool_size=app.config['DB_POOL_SIZE'],
+        pragmas=app.config['SQLITE_PRAGMAS'],
+        wal=app.config['DB_WAL'],
+        write_queue=app.config['DB_WRITE_QUEUE'],
+    )
+    app.extensions['db'] = db
+    return db
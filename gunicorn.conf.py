@@ -1,4 +1,20 @@
-workers = 1
-worker_class = 'eventlet'
-bind = '0.0.0.0:$PORT'
+import os
+
+# Класс воркера соответствует асинхронному бэкенду Socket.IO (ASYNC_MODE)
+WORKER_CLASSES = {
+    'eventlet': 'eventlet',
+    'gevent': 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker',
+    'threading': 'gthread',
+}
+
+# Больше одного воркера - только вместе с SOCKETIO_MESSAGE_QUEUE (см. README):
+# без очереди emit доходит лишь до сокетов своего процесса
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+if workers > 1 and not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+    print(f"WEB_CONCURRENCY={workers} ignored: SOCKETIO_MESSAGE_QUEUE is not set, running 1 worker")
+    workers = 1
+worker_class = WORKER_CLASSES.get(os.environ.get('ASYNC_MODE', 'eventlet'), 'eventlet')
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 5000))
+threads = int(os.environ.get('THREADS', 16))
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
 timeout = 120
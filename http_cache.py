@@ -0,0 +1,123 @@
+# http_cache.py - валидаторы ETag, условные GET (304) и сжатие ответов
+#
+# ETag по умолчанию - хеш тела, он экономит только трафик. Маршрут с декоратором
+# conditional получает ETag из дешевого валидатора (состояние данных в БД), который
+# считается до обработчика: совпал - 304 без выборки и сериализации. У сжатых
+# представлений свой ETag с суффиксом кодировки и Vary: Accept-Encoding.
+import functools
+import gzip
+import hashlib
+
+from flask import current_app, request
+
+from cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain',
+    'application/javascript', 'text/javascript',
+}
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def encoded_etag(etag, encoding):
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def matched_etag(etag):
+    # Тег из If-None-Match, совпавший с etag или с ETag его сжатого представления:
+    # у клиента та же версия данных, какую бы кодировку он ни получил
+    variants = {encoded_etag(etag, encoding) for encoding in (None, 'gzip', 'br')}
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if tag in variants:
+            return tag
+    return None
+
+
+def private_no_cache(response):
+    if 'Cache-Control' not in response.headers:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+
+def conditional(validator):
+    # validator(**view_args) - дешевое состояние данных, от которых зависит ответ, или
+    # None (проверять нечем). ETag - хеш состояния и URL; если ответ зависит от
+    # пользователя, его должен учитывать и валидатор. Состояние читается до обработчика,
+    # поэтому ответ может оказаться новее своего ETag - это дает лишний полный ответ,
+    # но не устаревший 304
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            state = validator(*args, **kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+            etag = hashlib.sha1(repr((request.full_path, state)).encode()).hexdigest()
+            matched = matched_etag(etag)
+            if matched is not None:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched, weak=True)
+                private_no_cache(response)
+                response.vary.add('Accept-Encoding')
+                return response
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def init_http_cache(app, min_size=1024, level=6):
+    # Сжатые тела кэшируются по (ETag, кодировка): одинаковые ответы не сжимаются повторно
+    compressed = LRUCache(maxsize=512, ttl=3600)
+
+    @app.after_request
+    def conditional_response(response):
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+        if response.direct_passthrough or response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        data = response.get_data()
+        etag, weak = response.get_etag()
+        if etag is None:
+            # Маршрут без валидатора: слабый ETag по содержимому
+            etag, weak = hashlib.sha1(data).hexdigest(), True
+        private_no_cache(response)
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if len(data) < min_size or 'Content-Encoding' in response.headers:
+            encoding = None
+        response.set_etag(matched_etag(etag) or encoded_etag(etag, encoding), weak=weak)
+        response.make_conditional(request)
+        if response.status_code != 200 or encoding is None:
+            return response
+        body = compressed.get((etag, encoding))
+        if body is None:
+            body = compress(data, encoding, level)
+            compressed.put((etag, encoding), body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    app.extensions['http_cache'] = compressed
+    return compressed
@@ -0,0 +1,89 @@
+# http_media.py - отдача загруженных файлов: Range/206, ETag, кэширование, X-Accel/X-Sendfile
+#
+# Видео перематывается запросами Range, поэтому ответ отдает только нужный
+# кусок файла (206). Файлы хранилища media названы хешем содержимого и никогда не
+# меняются: их сервер (immutable=True) ставит Cache-Control immutable на год. В режиме
+# offload байты отдает фронтовой прокси (nginx X-Accel-Redirect, Apache/lighttpd
+# X-Sendfile), а воркер только проверяет путь и ставит заголовки.
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import current_app, request
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import wrap_file
+
+OFFLOAD_MODES = ('x-accel', 'x-sendfile')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class MediaServer:
+    def __init__(self, root, immutable=False, offload=None, accel_prefix='/_static/', read_size=256 * 1024):
+        self.root = root
+        self.immutable = immutable  # в root только файлы с именами по хешу содержимого
+        self.offload = offload if offload in OFFLOAD_MODES else None
+        self.accel_prefix = '/' + accel_prefix.strip('/') + '/'
+        self.read_size = read_size  # блок чтения при отдаче самим воркером
+        self.full = 0
+        self.partial = 0
+        self.not_modified = 0
+        self.offloaded = 0
+
+    def _cache_headers(self, response):
+        if self.immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            # Старые папки: имя не гарантирует неизменность, браузер сверяет ETag
+            response.cache_control.no_cache = True
+
+    def send(self, filename):
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+        if self.offload:
+            # Тело пустое: Range, условные запросы и sendfile выполняет прокси
+            response = current_app.response_class(mimetype=mimetype, direct_passthrough=True)
+            if self.offload == 'x-accel':
+                response.headers['X-Accel-Redirect'] = self.accel_prefix + quote(filename)
+            else:
+                response.headers['X-Sendfile'] = os.path.abspath(path)
+            self._cache_headers(response)
+            self.offloaded += 1
+            return response
+
+        stat = os.stat(path)
+        f = open(path, 'rb')
+        try:
+            response = current_app.response_class(wrap_file(request.environ, f, self.read_size),
+                                                  mimetype=mimetype, direct_passthrough=True)
+            response.content_length = stat.st_size
+            response.last_modified = stat.st_mtime
+            # Сильный ETag: для файлов по хешу это само имя, для остальных - размер и mtime
+            response.set_etag(os.path.basename(path) if self.immutable else f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+            self._cache_headers(response)
+            response.make_conditional(request, accept_ranges=True, complete_length=stat.st_size)
+        except RequestedRangeNotSatisfiable:
+            f.close()
+            raise
+        if response.status_code == 304:
+            f.close()
+            self.not_modified += 1
+        elif response.status_code == 206:
+            self.partial += 1
+        else:
+            self.full += 1
+        return response
+
+    def stats(self):
+        return {
+            'offload': self.offload,
+            'full': self.full,
+            'partial': self.partial,
+            'not_modified': self.not_modified,
+            'offloaded': self.offloaded,
+        }
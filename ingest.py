@@ -0,0 +1,109 @@
+# ingest.py - конвейер записи сообщений AURA Messenger
+#
+# Обработчик сокета кладет сообщение в очередь и сразу рассылает его комнате;
+# фоновая задача забирает очередь пачками (batch_size сообщений или batch_delay
+# секунд) и сохраняет каждую пачку одной транзакцией. Подтверждение с id
+# отправитель получает, когда его пачка закоммичена.
+import os
+import queue
+import threading
+import time
+
+
+class IngestFull(Exception):
+    pass
+
+
+class PendingMessage:
+    __slots__ = ('message', 'id', 'error', 'done')
+
+    def __init__(self, message):
+        self.message = message
+        self.id = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        # id после коммита; исключение, если пачку записать не удалось
+        if not self.done.wait(timeout):
+            raise TimeoutError('Сообщение не записано вовремя')
+        if self.error is not None:
+            raise self.error
+        return self.id
+
+
+class MessageIngest:
+    def __init__(self, save_many, start_task, batch_size=500, batch_delay=0.005, max_queue=10000, on_saved=None):
+        self.save_many = save_many  # save_many([message, ...]) -> [id, ...] одной транзакцией
+        self.start_task = start_task
+        self.on_saved = on_saved  # on_saved(message, id) - для кэшей после коммита
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.batches = 0
+        self.saved = 0
+        self.failed = 0
+        self._queue = queue.Queue(max_queue)
+        self._pid = None
+
+    def _ensure_started(self):
+        # Задача запускается лениво и заново в каждом воркере после fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue = queue.Queue(self._queue.maxsize)
+            self.start_task(self._run)
+
+    def submit(self, message):
+        self._ensure_started()
+        pending = PendingMessage(message)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise IngestFull('Очередь сообщений переполнена')
+        return pending
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        try:
+            ids = self.save_many([pending.message for pending in batch])
+        except Exception as e:
+            print(f"Error saving messages: {e}")
+            self.failed += len(batch)
+            for pending in batch:
+                pending.error = e
+                pending.done.set()
+            return
+        self.batches += 1
+        self.saved += len(batch)
+        for pending, message_id in zip(batch, ids):
+            pending.id = message_id
+            if self.on_saved is not None:
+                try:
+                    self.on_saved(pending.message, message_id)
+                except Exception as e:
+                    print(f"Error after saving message: {e}")
+            pending.done.set()
+
+    def _run(self):
+        while True:
+            self._commit(self._collect(self._queue.get()))
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'batch_size': self.batch_size,
+            'batch_delay': self.batch_delay,
+            'batches': self.batches,
+            'saved': self.saved,
+            'failed': self.failed,
+            'avg_batch': round(self.saved / self.batches, 2) if self.batches else 0.0,
+        }
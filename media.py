@@ -0,0 +1,147 @@
+# media.py - хранилище файлов по содержимому для AURA Messenger
+#
+# Файл называется SHA-256 своего содержимого и лежит в root/ab/cd/<hash>.<ext>,
+# поэтому одинаковые загрузки хранятся один раз, имена не сталкиваются, а
+# содержимое по адресу никогда не меняется. Сколько строк БД ссылается на файл,
+# считает таблица media (storage.MediaRepository); файлы без ссылок удаляет gc()
+# после срока ожидания - за это время загрузка успевает попасть в сообщение.
+import hashlib
+import os
+import time
+
+COPY_BUFFER = 64 * 1024
+
+
+class MediaStore:
+    def __init__(self, root, url_prefix, registry):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.registry = registry
+        self.tmp = os.path.join(root, 'tmp')
+        self.trash = os.path.join(root, 'trash')
+        os.makedirs(self.tmp, exist_ok=True)
+        os.makedirs(self.trash, exist_ok=True)
+
+    def _relative(self, digest, ext):
+        name = f'{digest}.{ext}' if ext else digest
+        return os.path.join(digest[:2], digest[2:4], name)
+
+    def url_for(self, relative):
+        return f"{self.url_prefix}/{relative.replace(os.sep, '/')}"
+
+    def temp_path(self):
+        return os.path.join(self.tmp, os.urandom(16).hex())
+
+    def _place(self, temp, digest, ext, size):
+        relative = self._relative(digest, ext)
+        url = self.url_for(relative)
+        # Сначала регистрация (продлевает жизнь существующему файлу), потом файл на диск
+        self.registry.register(digest, url, size)
+        target = os.path.join(self.root, relative)
+        if os.path.exists(target):
+            os.remove(temp)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp, target)
+        return url
+
+    def save_stream(self, stream, ext):
+        # Поток пишется во временный файл с подсчетом хеша, в памяти - один буфер
+        temp = self.temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp, 'wb') as f:
+                while True:
+                    data = stream.read(COPY_BUFFER)
+                    if not data:
+                        break
+                    digest.update(data)
+                    f.write(data)
+                    size += len(data)
+            return self._place(temp, digest.hexdigest(), ext, size)
+        except Exception:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def save_file(self, path, ext):
+        # Файл из temp_path() (собранная загрузка) переносится без копирования
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(COPY_BUFFER)
+                if not data:
+                    break
+                digest.update(data)
+                size += len(data)
+        temp = self.temp_path()
+        os.replace(path, temp)
+        return self._place(temp, digest.hexdigest(), ext, size)
+
+    def path_for(self, url):
+        # Путь на диске для URL хранилища или None для чужих путей
+        if not url or not url.startswith(self.url_prefix + '/'):
+            return None
+        relative = url[len(self.url_prefix) + 1:]
+        if '..' in relative.split('/'):
+            return None
+        return os.path.join(self.root, *relative.split('/'))
+
+    def variant_path(self, url, name):
+        # Вариант (variants.py) лежит рядом с оригиналом: (путь на диске, URL)
+        path = self.path_for(url)
+        base = os.path.basename(path).split('.', 1)[0]
+        path = os.path.join(os.path.dirname(path), f'{base}.{name}.webp')
+        return path, url.rsplit('/', 1)[0] + '/' + os.path.basename(path)
+
+    def _remove_variants(self, path, digest):
+        folder = os.path.dirname(path)
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(digest + '.'):
+                try:
+                    os.remove(os.path.join(folder, name))
+                except OSError:
+                    pass
+
+    def gc(self, grace=24 * 3600, limit=500):
+        # Файл сначала уходит в корзину, затем удаляется строка; если за это время
+        # файл снова загрузили (строка обновлена), он возвращается на место
+        older_than = int(time.time() - grace)
+        removed = 0
+        for digest, url in self.registry.garbage(older_than, limit):
+            path = self.path_for(url)
+            trashed = os.path.join(self.trash, digest)
+            try:
+                os.replace(path, trashed)
+            except OSError:
+                trashed = None
+            if self.registry.delete_unreferenced(digest, older_than):
+                removed += 1
+                if trashed:
+                    os.remove(trashed)
+                self._remove_variants(path, digest)
+            elif trashed:
+                if os.path.exists(path):
+                    os.remove(trashed)
+                else:
+                    os.replace(trashed, path)
+        self._sweep_tmp(grace)
+        return removed
+
+    def _sweep_tmp(self, max_age):
+        # Временные файлы оборванных записей
+        now = time.time()
+        for folder in (self.tmp, self.trash):
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                try:
+                    if now - os.path.getmtime(path) > max_age:
+                        os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,260 @@
+# migrations.py - версионированные миграции схемы AURA Messenger
+#
+# Миграции применяются по порядку при старте приложения. Уже выпущенные
+# миграции не меняются: любое изменение схемы - это новая запись в конце MIGRATIONS.
+# Шаг - функция, список SQL или словарь {'sqlite': ..., 'postgres': ...} для
+# различий между движками; SQL пишется в диалекте SQLite (см. db.translate_sql).
+
+
+def _initial_schema(conn):
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_online BOOLEAN DEFAULT FALSE,
+            avatar_color TEXT DEFAULT '#6366F1',
+            avatar_path TEXT,
+            theme TEXT DEFAULT 'dark',
+            profile_description TEXT DEFAULT ''
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            message TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            room TEXT DEFAULT 'public',
+            recipient TEXT,
+            message_type TEXT DEFAULT 'text',
+            file_path TEXT,
+            file_name TEXT,
+            is_favorite BOOLEAN DEFAULT FALSE
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            display_name TEXT,
+            description TEXT,
+            created_by TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_private BOOLEAN DEFAULT FALSE,
+            allow_messages BOOLEAN DEFAULT TRUE,
+            avatar_path TEXT,
+            subscriber_count INTEGER DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS channel_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER,
+            username TEXT NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_admin BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (channel_id) REFERENCES channels (id),
+            UNIQUE(channel_id, username)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS favorites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            content TEXT,
+            file_path TEXT,
+            file_name TEXT,
+            file_type TEXT DEFAULT 'text',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_pinned BOOLEAN DEFAULT FALSE,
+            category TEXT DEFAULT 'general'
+        )
+    ''')
+    # Создаем общий канал по умолчанию
+    c.execute('INSERT OR IGNORE INTO channels (name, display_name, description, created_by) VALUES (?, ?, ?, ?)',
+             ('general', 'General', 'Общий канал', 'system'))
+
+
+MIGRATIONS = [
+    (1, 'initial schema', _initial_schema),
+    (2, 'secondary indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_messages_room_id ON messages (room, id)',
+        'CREATE INDEX IF NOT EXISTS idx_messages_username_recipient ON messages (username, recipient)',
+        'CREATE INDEX IF NOT EXISTS idx_messages_recipient_username ON messages (recipient, username)',
+        'CREATE INDEX IF NOT EXISTS idx_channel_members_username ON channel_members (username, channel_id)',
+        'CREATE INDEX IF NOT EXISTS idx_favorites_username_pinned ON favorites (username, is_pinned, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_favorites_username_category ON favorites (username, category)',
+    ]),
+    # Полнотекстовый поиск по сообщениям: в SQLite - FTS5 с внешним содержимым
+    # (текст не дублируется), синхронизируется триггерами; в PostgreSQL - GIN по tsvector
+    (3, 'message search', {
+        'sqlite': [
+            '''CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                message, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )''',
+            '''CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+            END''',
+            "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+        ],
+        'postgres': [
+            "CREATE INDEX IF NOT EXISTS idx_messages_fts ON messages USING GIN (to_tsvector('simple', COALESCE(message, '')))",
+        ],
+    }),
+    # Хранилище файлов по содержимому: один файл на хеш, счетчик ссылок из сообщений,
+    # избранного и аватаров; updated_at (unix-время) - для срока ожидания перед удалением
+    (4, 'media store', [
+        '''CREATE TABLE IF NOT EXISTS media (
+            hash TEXT PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size BIGINT NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            updated_at BIGINT NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_media_refcount_updated ON media (refcount, updated_at)',
+    ]),
+    # Уменьшенные копии изображений (variants.py): source - URL оригинала в media,
+    # строки удаляются вместе со строкой оригинала
+    (5, 'media variants', [
+        '''CREATE TABLE IF NOT EXISTS media_variants (
+            source TEXT NOT NULL,
+            name TEXT NOT NULL,
+            path TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            size BIGINT NOT NULL,
+            PRIMARY KEY (source, name)
+        )''',
+    ]),
+    # Список личных чатов: строка на участника переписки, обновляется при записи
+    # сообщения (storage.MessageRepository.save_many); существующие переписки заполняются
+    # по истории, счетчики непрочитанных начинают с нуля
+    (6, 'conversations', [
+        '''CREATE TABLE IF NOT EXISTS conversations (
+            username TEXT NOT NULL,
+            room TEXT NOT NULL,
+            partner TEXT NOT NULL,
+            last_message_id BIGINT NOT NULL,
+            last_activity TIMESTAMP,
+            unread INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, room)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_conversations_username_last ON conversations (username, last_message_id)',
+        '''INSERT INTO conversations (username, room, partner, last_message_id, last_activity, unread)
+            SELECT p.username, p.room, p.partner, p.last_id, m.timestamp, 0
+            FROM (
+                SELECT username, room, partner, MAX(id) AS last_id FROM (
+                    SELECT username, room, recipient AS partner, id FROM messages
+                    WHERE room LIKE 'private_%' AND recipient IS NOT NULL
+                    UNION ALL
+                    SELECT recipient, room, username, id FROM messages
+                    WHERE room LIKE 'private_%' AND recipient IS NOT NULL AND recipient != username
+                ) participants
+                GROUP BY username, room, partner
+            ) p
+            JOIN messages m ON m.id = p.last_id''',
+    ]),
+    # Курсоры прочтения: messages.seq - номер сообщения в комнате, room_state.seq - число
+    # сообщений комнаты, поэтому непрочитанные = room_state.seq - read_cursors.read_seq.
+    # Участники каналов считаются прочитавшими все, в личных чатах курсор ставится так,
+    # чтобы сохранить прежний счетчик conversations.unread - его заменяют курсоры
+    (7, 'read cursors', [
+        'ALTER TABLE messages ADD COLUMN seq BIGINT',
+        '''UPDATE messages SET seq = numbered.seq
+            FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY room ORDER BY id) AS seq FROM messages) numbered
+            WHERE messages.id = numbered.id''',
+        '''CREATE TABLE IF NOT EXISTS room_state (
+            room TEXT PRIMARY KEY,
+            seq BIGINT NOT NULL DEFAULT 0,
+            last_message_id BIGINT
+        )''',
+        'INSERT INTO room_state (room, seq, last_message_id) SELECT room, COUNT(*), MAX(id) FROM messages GROUP BY room',
+        '''CREATE TABLE IF NOT EXISTS read_cursors (
+            username TEXT NOT NULL,
+            room TEXT NOT NULL,
+            last_read_message_id BIGINT NOT NULL,
+            read_seq BIGINT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (username, room)
+        )''',
+        '''INSERT OR IGNORE INTO read_cursors (username, room, last_read_message_id, read_seq)
+            SELECT cm.username, r.room, r.last_message_id, r.seq
+            FROM channel_members cm
+            JOIN channels ch ON ch.id = cm.channel_id
+            JOIN room_state r ON r.room = 'channel_' || ch.name''',
+        '''INSERT OR IGNORE INTO read_cursors (username, room, last_read_message_id, read_seq)
+            SELECT username, room, COALESCE((SELECT id FROM messages WHERE room = c.room AND seq = c.read_seq), 0),
+                   read_seq
+            FROM (
+                SELECT cv.username, cv.room, CASE WHEN cv.unread < r.seq THEN r.seq - cv.unread ELSE 0 END AS read_seq
+                FROM conversations cv
+                JOIN room_state r ON r.room = cv.room
+            ) c''',
+        'ALTER TABLE conversations DROP COLUMN unread',
+    ]),
+    # Онлайн-статусы по воркерам: строка на пару (пользователь, воркер), пока у воркера
+    # есть соединение пользователя; users.is_online пересчитывается по этой таблице.
+    # Строки упавшего воркера удаляются по updated_at (см. presence.PresenceTracker.touch)
+    (8, 'presence', [
+        '''CREATE TABLE IF NOT EXISTS presence (
+            username TEXT NOT NULL,
+            worker TEXT NOT NULL,
+            updated_at BIGINT NOT NULL,
+            PRIMARY KEY (username, worker)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_presence_worker ON presence (worker)',
+        'UPDATE users SET is_online = FALSE WHERE is_online',
+    ]),
+    # Версии изменяемых данных, от которых зависят ответы API (аватары, варианты
+    # изображений). Номер растет в транзакции самого изменения, поэтому валидатор ETag,
+    # прочитанный до выполнения запроса, верен при любом числе воркеров
+    (9, 'change versions', [
+        '''CREATE TABLE IF NOT EXISTS change_versions (
+            scope TEXT PRIMARY KEY,
+            version BIGINT NOT NULL
+        )''',
+    ]),
+]
+
+
+def current_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn):
+    # Выполняется одной транзакцией писателя: при ошибке схема остается на прежней версии
+    version = current_version(conn)
+    applied = []
+    for number, name, step in MIGRATIONS:
+        if number <= version:
+            continue
+        if isinstance(step, dict):
+            step = step.get(getattr(conn, 'dialect', 'sqlite'), [])
+        if callable(step):
+            step(conn)
+        else:
+            for sql in step:
+                conn.execute(sql)
+        conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (number, name))
+        applied.append(number)
+    if applied:
+        print(f"Applied migrations: {applied}")
+    return applied
@@ -0,0 +1,132 @@
+# presence.py - онлайн-статусы пользователей AURA Messenger
+#
+# Статус хранится в памяти процесса: у пользователя может быть несколько
+# соединений (вкладки, переподключения), онлайн он, пока открыто хотя бы одно.
+# В БД изменения сбрасываются пачкой раз в interval секунд, поэтому шторм
+# переподключений не превращается в шторм UPDATE. Так же, окнами, копятся
+# изменения для рассылки клиентам (см. take_changes).
+#
+# Воркеров может быть несколько: каждый пишет в таблицу presence только свои строки
+# (worker_id), а users.is_online - онлайн ли пользователь хоть где-то. Строки
+# продлеваются раз в ttl / 3 секунд, строки упавшего воркера удаляются через ttl.
+import os
+import socket
+import time
+
+from concurrency import original
+
+
+class PresenceTracker:
+    def __init__(self, flush, touch, interval=2.0, ttl=90):
+        self.flush_fn = flush  # flush(worker, {username: online}) - одна транзакция на пачку
+        self.touch_fn = touch  # touch(worker, expire_before) - продление своих строк
+        self.interval = interval
+        self.ttl = ttl
+        self.flushes = 0
+        self.flushed = 0
+        self._connections = {}  # username -> множество sid
+        self._pending = {}  # username -> статус, еще не записанный в БД
+        self._changes = {}  # username -> статус, еще не разосланный клиентам
+        self._announced = {}  # username -> последний разосланный статус
+        self._worker = (None, None)  # (pid, идентификатор воркера)
+        self._next_touch = 0
+        self._lock = original('threading').Lock()
+
+    def worker_id(self):
+        # Идентификатор воркера в таблице presence, свой у каждого процесса после fork;
+        # случайный хвост - чтобы перезапущенный процесс с тем же pid не подхватил чужие строки
+        pid = os.getpid()
+        if self._worker[0] != pid:
+            self._worker = (pid, f'{socket.gethostname()}:{pid}:{os.urandom(4).hex()}')
+        return self._worker[1]
+
+    def connect(self, username, sid):
+        # True, если пользователь только что стал онлайн
+        with self._lock:
+            sids = self._connections.setdefault(username, set())
+            came_online = not sids
+            sids.add(sid)
+            if came_online:
+                self._pending[username] = True
+                self._changes[username] = True
+            return came_online
+
+    def disconnect(self, username, sid):
+        # True, если закрыто последнее соединение пользователя
+        with self._lock:
+            sids = self._connections.get(username)
+            if not sids or sid not in sids:
+                return False
+            sids.discard(sid)
+            if sids:
+                return False
+            del self._connections[username]
+            self._pending[username] = False
+            self._changes[username] = False
+            return True
+
+    def status(self, username, stored=False):
+        # Локальные соединения важнее значения из БД: stored - это users.is_online,
+        # в нем учтены соединения других воркеров
+        with self._lock:
+            if username in self._connections:
+                return True
+            return bool(stored)
+
+    def take_changes(self):
+        # Изменения за окно; вышел и вернулся внутри окна - рассылать нечего
+        with self._lock:
+            changes, self._changes = self._changes, {}
+            result = {}
+            for username, online in changes.items():
+                if self._announced.get(username, False) != online:
+                    result[username] = online
+                if online:
+                    self._announced[username] = True
+                else:
+                    self._announced.pop(username, None)
+            return result
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            self.flush_fn(self.worker_id(), pending)
+        except Exception as e:
+            print(f"Error flushing presence: {e}")
+            with self._lock:
+                # Возвращаем в очередь то, что не успело измениться заново
+                for username, online in pending.items():
+                    self._pending.setdefault(username, online)
+            return 0
+        with self._lock:
+            self.flushes += 1
+            self.flushed += len(pending)
+        return len(pending)
+
+    def touch(self):
+        # Раз в ttl / 3 секунд; пока воркер жив, его строки в presence не устаревают
+        now = time.time()
+        if now < self._next_touch:
+            return []
+        try:
+            stale = self.touch_fn(self.worker_id(), int(now - self.ttl))
+        except Exception as e:
+            print(f"Error refreshing presence: {e}")
+            return []
+        self._next_touch = now + self.ttl / 3
+        return stale
+
+    def stats(self):
+        with self._lock:
+            return {
+                'online': len(self._connections),
+                'connections': sum(len(sids) for sids in self._connections.values()),
+                'pending': len(self._pending),
+                'interval': self.interval,
+                'worker': self._worker[1],
+                'flushes': self.flushes,
+                'flushed': self.flushed,
+            }
@@ -0,0 +1,48 @@
+# ratelimit.py - ограничение частоты запросов AURA Messenger
+import time
+from collections import OrderedDict
+
+from concurrency import original
+
+
+class TokenBucketLimiter:
+    # Корзина на ключ (пользователя): rate токенов в секунду, не больше burst подряд.
+    # Давно неактивные ключи вытесняются, чтобы память не росла с числом сессий.
+    def __init__(self, rate=5.0, burst=10, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.limited = 0
+        self._buckets = OrderedDict()  # key -> [токены, время последнего пополнения]
+        self._lock = original('threading').Lock()
+
+    def hit(self, key, cost=1):
+        # (True, 0), если запрос пропущен, иначе (False, секунд до следующей попытки)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return True, 0
+            self.limited += 1
+            return False, (cost - bucket[0]) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._buckets),
+                'rate': self.rate,
+                'burst': self.burst,
+                'allowed': self.allowed,
+                'limited': self.limited,
+            }
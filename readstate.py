@@ -0,0 +1,62 @@
+# readstate.py - буфер курсоров прочтения AURA Messenger
+#
+# Клиент сообщает, докуда дочитал комнату, событием read - часто, при каждой
+# прокрутке и каждом новом сообщении в открытом чате. Курсоры копятся в памяти
+# (на пару пользователь+комната остается один, самый дальний) и раз в interval
+# секунд пишутся в read_cursors одной транзакцией (storage.ReadStateRepository.advance).
+from concurrency import original
+
+
+class ReadCursorBuffer:
+    def __init__(self, flush, interval=1.0, max_batch=5000):
+        self.flush_fn = flush  # flush({(username, room): id}) -> [(username, room, id, непрочитанных), ...]
+        self.interval = interval
+        self.max_batch = max_batch
+        self.received = 0
+        self.flushes = 0
+        self.advanced = 0
+        self._pending = {}  # (username, room) -> id сообщения или None - последнее в комнате
+        self._lock = original('threading').Lock()
+
+    def update(self, username, room, message_id=None):
+        key = (username, room)
+        with self._lock:
+            self.received += 1
+            if key in self._pending:
+                current = self._pending[key]
+                if current is None or (message_id is not None and message_id <= current):
+                    return
+            self._pending[key] = message_id
+
+    def flush(self):
+        with self._lock:
+            if len(self._pending) <= self.max_batch:
+                pending, self._pending = self._pending, {}
+            else:
+                keys = list(self._pending)[:self.max_batch]
+                pending = {key: self._pending.pop(key) for key in keys}
+        if not pending:
+            return []
+        try:
+            advanced = self.flush_fn(pending)
+        except Exception as e:
+            print(f"Error flushing read cursors: {e}")
+            with self._lock:
+                # Возвращаем в очередь то, что не было обновлено заново
+                for key, message_id in pending.items():
+                    self._pending.setdefault(key, message_id)
+            return []
+        with self._lock:
+            self.flushes += 1
+            self.advanced += len(advanced)
+        return advanced
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'interval': self.interval,
+                'received': self.received,
+                'flushes': self.flushes,
+                'advanced': self.advanced,
+            }
@@ -0,0 +1,136 @@
+# search_index.py - индекс в памяти для поиска пользователей и каналов AURA Messenger
+#
+# Точные и префиксные совпадения ищутся бинарным поиском по отсортированному
+# списку полей. Для подстрок каждое поле режется на n-граммы (2 и 3 символа):
+# запрос идет по самому короткому списку документов своих n-грамм и проверяет
+# кандидатов подстрокой. Оба шага просматривают не больше scan_limit записей
+# (строк отсортированного списка и кандидатов из n-грамм), поэтому время ответа
+# не растет с числом пользователей.
+# Ранжирование: точное совпадение, затем префикс, затем подстрока; при
+# равенстве - более раннее поле и более короткое значение.
+import bisect
+import heapq
+import itertools
+import time
+
+from concurrency import original
+
+EXACT, PREFIX, SUBSTRING = 0, 1, 2
+
+
+def normalize(value):
+    return ' '.join((value or '').lower().split())
+
+
+def ngrams(value, size):
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+class SearchIndex:
+    def __init__(self, loader, max_age=None, scan_limit=2000):
+        self.loader = loader  # loader() -> [(key, [поле, ...]), ...] для полной перестройки
+        self.max_age = max_age  # None - индекс обновляется только через add/remove
+        self.scan_limit = scan_limit
+        self.built_at = None
+        self.queries = 0
+        self._docs = {}  # key -> [нормализованные поля]
+        self._postings = {}  # n-грамма -> множество key
+        self._sorted = []  # отсортированные (поле, позиция поля, key)
+        self._lock = original('threading').Lock()
+
+    def _index(self, key, fields, sort=True):
+        self._docs[key] = fields
+        for position, field in enumerate(fields):
+            if sort:
+                bisect.insort(self._sorted, (field, position, key))
+            else:
+                self._sorted.append((field, position, key))
+            for size in (2, 3):
+                for gram in ngrams(field, size):
+                    self._postings.setdefault(gram, set()).add(key)
+
+    def _unindex(self, key):
+        for position, field in enumerate(self._docs.pop(key, [])):
+            index = bisect.bisect_left(self._sorted, (field, position, key))
+            if index < len(self._sorted) and self._sorted[index] == (field, position, key):
+                del self._sorted[index]
+            for size in (2, 3):
+                for gram in ngrams(field, size):
+                    keys = self._postings.get(gram)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self._postings[gram]
+
+    def rebuild(self):
+        docs = [(key, [normalize(field) for field in fields]) for key, fields in self.loader()]
+        with self._lock:
+            self._docs = {}
+            self._postings = {}
+            self._sorted = []
+            for key, fields in docs:
+                self._index(key, fields, sort=False)
+            self._sorted.sort()
+            self.built_at = time.monotonic()
+
+    def add(self, key, fields):
+        with self._lock:
+            self._unindex(key)
+            self._index(key, [normalize(field) for field in fields])
+
+    def _stale(self):
+        if self.built_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.built_at > self.max_age
+
+    def _prefix_matches(self, query, ranks, exclude):
+        index = bisect.bisect_left(self._sorted, (query,))
+        for field, position, key in self._sorted[index:index + self.scan_limit]:
+            if not field.startswith(query):
+                break
+            if key != exclude:
+                self._rank(ranks, key, (EXACT if field == query else PREFIX, position, len(field)))
+
+    def _substring_matches(self, query, ranks, exclude):
+        if len(query) < 2:
+            return
+        size = 3 if len(query) >= 3 else 2
+        postings = sorted((self._postings.get(gram, set()) for gram in ngrams(query, size)), key=len)
+        if not postings[0]:
+            return
+        # Кандидатов просматриваем не больше scan_limit, даже если совпадений среди них мало
+        for key in itertools.islice(postings[0], self.scan_limit):
+            if key == exclude or key in ranks or not all(key in posting for posting in postings[1:]):
+                continue
+            for position, field in enumerate(self._docs[key]):
+                if query in field:
+                    self._rank(ranks, key, (SUBSTRING, position, len(field)))
+                    break
+
+    def _rank(self, ranks, key, rank):
+        if key not in ranks or rank < ranks[key]:
+            ranks[key] = rank
+
+    def search(self, query, limit=20, exclude=None):
+        query = normalize(query)
+        if not query:
+            return []
+        if self._stale():
+            self.rebuild()
+        with self._lock:
+            self.queries += 1
+            ranks = {}
+            self._prefix_matches(query, ranks, exclude)
+            # Подстроки нужны, только если префиксов не хватило на страницу
+            if len(ranks) < limit:
+                self._substring_matches(query, ranks, exclude)
+        return [key for key, rank in heapq.nsmallest(limit, ranks.items(), key=lambda item: (item[1], item[0]))]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'ngrams': len(self._postings),
+                'queries': self.queries,
+                'max_age': self.max_age,
+            }
@@ -0,0 +1,1186 @@
+const socket = io(window.AURA_BOOTSTRAP.socket_options || {});
+const user = window.AURA_BOOTSTRAP.username;
+let currentRoom = "favorites";
+let currentRoomType = "favorites";
+let currentChannel = "";
+let oldestMessageId = null;
+let hasMoreHistory = false;
+let loadingHistory = false;
+const HISTORY_PAGE_SIZE = 50;
+let unreadState = {};  // комната -> {unread, last_read_message_id, partner_read_message_id}
+let pendingReads = {};  // комната -> id прочитанного сообщения или null (все в комнате)
+let readTimer = null;
+let isMobile = window.innerWidth <= 768;
+let emojiData = ["😀", "😁", "😂", "🤣", "😃", "😄", "😅", "😆", "😉", "😊", "😋", "😎", "😍", "😘", "😗", "😙", "😚", "🙂", "🤗", "🤔", "👋", "🤚", "🖐️", "✋", "🖖", "👌", "🤌", "🤏", "✌️", "🤞", "🤟", "🤘", "🤙", "👈", "👉", "👆", "🖕", "👇", "☝️", "👍", "🐶", "🐱", "🐭", "🐹", "🐰", "🦊", "🐻", "🐼", "🐨", "🐯", "🦁", "🐮", "🐷", "🐸", "🐵", "🙈", "🙉", "🙊", "🐔", "🐧", "🍏", "🍎", "🍐", "🍊", "🍋", "🍌", "🍉", "🍇", "🍓", "🫐", "🍈", "🍒", "🍑", "🥭", "🍍", "🥥", "🥝", "🍅", "🍆", "🥑", "⌚", "📱", "📲", "💻", "⌨️", "🖥️", "🖨️", "🖱️", "🖲️", "🕹️", "🗜️", "💽", "💾", "💿", "📀", "📼", "📷", "📸", "📹", "🎥"];
+
+// Добавить эффекты нажатия для всех кнопок
+function addButtonEffects() {
+    document.querySelectorAll('button').forEach(button => {
+        if (!button.classList.contains('btn-effect')) {
+            button.classList.add('btn-effect');
+        }
+    });
+    document.querySelectorAll('.nav-item').forEach(item => {
+        item.classList.add('btn-effect');
+    });
+    document.querySelectorAll('.search-user-item, .search-channel-item').forEach(item => {
+        item.classList.add('btn-effect');
+    });
+}
+
+// Инициализация
+window.onload = function() {
+    loadBootstrap();
+    initEmojis();
+    checkMobile();
+    addButtonEffects(); // Добавляем эффекты кнопок
+    
+    // Событие ресайза
+    window.addEventListener('resize', checkMobile);
+    
+    // Авторазмер textarea
+    document.getElementById('msg-input').addEventListener('input', function() {
+        this.style.height = 'auto';
+        this.style.height = Math.min(this.scrollHeight, 120) + 'px';
+    });
+    
+    // Отправка сообщения по Enter
+    document.getElementById('msg-input').addEventListener('keydown', function(e) {
+        if (e.key === 'Enter' && !e.shiftKey) {
+            e.preventDefault();
+            sendMessage();
+        }
+    });
+    
+    // Поиск
+    // Запрос уходит после паузы в наборе, а не на каждую нажатую клавишу
+    let searchTimer = null;
+    document.getElementById('search-input').addEventListener('input', function(e) {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => performSearch(e.target.value.trim()), SEARCH_DEBOUNCE_MS);
+    });
+    
+    // Подгрузка истории при прокрутке к началу
+    document.getElementById('messages').addEventListener('scroll', function() {
+        if (this.scrollTop < 80) {
+            loadOlderMessages();
+        }
+    });
+};
+
+function checkMobile() {
+    isMobile = window.innerWidth <= 768;
+}
+
+function toggleSidebar() {
+    if (isMobile) {
+        document.getElementById('sidebar').classList.toggle('active');
+    }
+}
+
+// Стартовые данные (профиль, личные чаты, каналы, избранное) - одним запросом
+function loadBootstrap() {
+    document.getElementById('user-avatar').textContent = user.slice(0, 2).toUpperCase();
+    fetch('/bootstrap')
+        .then(r => r.json())
+        .then(data => {
+            if (data.success) {
+                unreadState = data.unread || {};
+                renderUserInfo(data.user);
+                renderPersonalChats(data.personal_chats);
+                renderChannels(data.channels);
+                renderFavorites(data.favorites);
+            }
+        });
+}
+
+// Аватар и тема пользователя
+function renderUserInfo(data) {
+    const avatar = document.getElementById('user-avatar');
+    if (data.avatar_path) {
+        avatar.style.backgroundImage = `url(${data.avatar_path})`;
+        avatar.textContent = '';
+    } else {
+        avatar.style.backgroundColor = data.avatar_color;
+    }
+    document.documentElement.setAttribute('data-theme', data.theme || 'dark');
+    document.getElementById('theme-select').value = data.theme || 'dark';
+}
+
+// Поиск
+const SEARCH_DEBOUNCE_MS = 200;
+let searchSeq = 0;
+
+function performSearch(query) {
+    const seq = ++searchSeq;
+    if (query.length < 2) {
+        document.getElementById('search-results').style.display = 'none';
+        return;
+    }
+    fetch(`/search_users_channels?q=${encodeURIComponent(query)}`)
+        .then(r => r.json())
+        .then(data => {
+            // Ответ на устаревший запрос не перетирает более свежий
+            if (seq === searchSeq && data.success) {
+                displaySearchResults(data.results);
+            }
+        });
+}
+
+function displaySearchResults(results) {
+    const container = document.getElementById('search-results');
+    container.innerHTML = '';
+    
+    if (results.users && results.users.length > 0) {
+        results.users.forEach(userData => {
+            if (userData.username !== user) {
+                const item = document.createElement('div');
+                item.className = 'search-user-item';
+                item.onclick = () => openChat(userData.username, 'private', userData.username);
+                item.innerHTML = `
+                    <div class="search-user-avatar" style="background-color: ${userData.color};">
+                        ${userData.avatar ? '' : userData.username.slice(0, 2).toUpperCase()}
+                    </div>
+                    <div class="search-user-info">
+                        <div class="search-user-name">${userData.username}</div>
+                        <div class="search-user-desc">${userData.profile_description || 'Пользователь'}</div>
+                    </div>
+                `;
+                if (userData.avatar) {
+                    item.querySelector('.search-user-avatar').style.backgroundImage = `url(${userData.avatar})`;
+                    item.querySelector('.search-user-avatar').textContent = '';
+                }
+                container.appendChild(item);
+            }
+        });
+    }
+    
+    if (results.channels && results.channels.length > 0) {
+        results.channels.forEach(channel => {
+            const item = document.createElement('div');
+            item.className = 'search-channel-item';
+            item.onclick = () => openChat(channel.name, 'channel', channel.display_name);
+            item.innerHTML = `
+                <div class="search-channel-avatar">
+                    ${channel.avatar_path ? '' : channel.display_name.slice(0, 2).toUpperCase()}
+                </div>
+                <div class="search-channel-info">
+                    <div class="search-channel-name">${channel.display_name}</div>
+                    <div class="search-channel-desc">${channel.description || 'Канал'}</div>
+                </div>
+            `;
+            container.appendChild(item);
+        });
+    }
+    
+    if (container.children.length > 0) {
+        container.style.display = 'block';
+    }
+    
+    // Добавить эффекты для новых элементов
+    addButtonEffects();
+}
+
+// Личные чаты: собеседник и последнее сообщение переписки
+function renderPersonalChats(chats) {
+    const container = document.getElementById('personal-chats-list');
+    container.innerHTML = '';
+    if (chats.length === 0) {
+        container.innerHTML = '<div style="padding: 12px 16px; color: var(--text-light); font-size: 0.9rem;">Нет личных чатов</div>';
+    } else {
+        chats.forEach(chat => {
+            const chatUser = chat.username;
+            const item = document.createElement('a');
+            item.className = 'nav-item';
+            item.href = '#';
+            item.dataset.room = 'private_' + [user, chatUser].sort().join('_');
+            item.onclick = () => openChat(chatUser, 'private', chatUser);
+            item.innerHTML = `
+                <i class="fas fa-user"></i>
+                <span class="nav-item-text">${chatUser}<span class="nav-item-preview"></span></span>
+            `;
+            const last = chat.last_message;
+            if (last) {
+                item.querySelector('.nav-item-preview').textContent = last.message || last.file_name || 'Файл';
+            }
+            setUnreadBadge(item, chat.unread);
+            container.appendChild(item);
+        });
+    }
+    addButtonEffects();
+}
+
+// Загрузка каналов
+function loadChannels() {
+    fetch('/user_channels')
+        .then(r => r.json())
+        .then(data => {
+            if (data.success) {
+                renderChannels(data.channels);
+            }
+        });
+}
+
+function renderChannels(channels) {
+    const container = document.getElementById('channels-list');
+    container.innerHTML = '';
+    channels.forEach(channel => {
+        const item = document.createElement('a');
+        item.className = 'nav-item';
+        item.href = '#';
+        item.dataset.room = 'channel_' + channel.name;
+        item.onclick = () => openChat(channel.name, 'channel', channel.display_name);
+        item.innerHTML = `
+            <i class="fas fa-hashtag"></i>
+            <span class="nav-item-text">${channel.display_name}</span>
+        `;
+        setUnreadBadge(item, unreadState[item.dataset.room]?.unread);
+        container.appendChild(item);
+    });
+    addButtonEffects();
+}
+
+// Непрочитанные: счетчики считает сервер по курсорам прочтения
+function setUnreadBadge(item, count) {
+    let badge = item.querySelector('.nav-item-badge');
+    if (!count) {
+        badge?.remove();
+        return;
+    }
+    if (!badge) {
+        badge = document.createElement('span');
+        badge.className = 'nav-item-badge';
+        item.appendChild(badge);
+    }
+    badge.textContent = count > 99 ? '99+' : count;
+}
+
+function updateUnread(room, count) {
+    unreadState[room] = { ...unreadState[room], unread: count };
+    const item = document.querySelector(`.nav-item[data-room="${room}"]`);
+    if (item) setUnreadBadge(item, count);
+}
+
+// Курсоры копятся и уходят на сервер одним событием read
+function markRead(room, messageId = null) {
+    if (room in pendingReads && (pendingReads[room] === null || (messageId !== null && messageId <= pendingReads[room]))) return;
+    pendingReads[room] = messageId;
+    if (!readTimer) {
+        readTimer = setTimeout(() => {
+            const cursors = Object.entries(pendingReads).map(([room, message_id]) => ({ room, message_id }));
+            pendingReads = {};
+            readTimer = null;
+            socket.emit('read', { cursors });
+        }, 500);
+    }
+}
+
+// Отметки о прочтении: свои сообщения до messageId прочитаны собеседником
+function markOwnRead(messageId) {
+    if (!messageId) return;
+    document.querySelectorAll('.message.own[data-id]:not(.read)').forEach(element => {
+        if (Number(element.dataset.id) <= messageId) element.classList.add('read');
+    });
+}
+
+// Открытие чата
+function openChat(target, type, title) {
+    currentRoom = type === 'channel' ? 'channel_' + target : 'private_' + [user, target].sort().join('_');
+    currentRoomType = type;
+    currentChannel = target;
+    
+    // Обновляем заголовок
+    document.getElementById('chat-title').textContent = title;
+    
+    if (type === 'channel') {
+        document.getElementById('chat-header-avatar').className = 'chat-avatar channel-avatar';
+        document.getElementById('chat-header-avatar').textContent = title.slice(0, 2).toUpperCase();
+        document.getElementById('chat-subtitle').textContent = 'Канал';
+        
+        // Загружаем информацию о канале
+        fetch(`/channel_info/${target}`)
+            .then(r => r.json())
+            .then(data => {
+                if (data.success) {
+                    document.getElementById('chat-subtitle').textContent = data.data.description || 'Канал';
+                    const avatar = document.getElementById('chat-header-avatar');
+                    if (data.data.avatar_path) {
+                        avatar.style.backgroundImage = `url(${data.data.avatar_path})`;
+                        avatar.textContent = '';
+                    }
+                }
+            });
+    } else {
+        document.getElementById('chat-header-avatar').className = 'chat-avatar';
+        document.getElementById('chat-header-avatar').textContent = title.slice(0, 2).toUpperCase();
+        document.getElementById('chat-subtitle').innerHTML = '<span class="status-dot"></span> Online';
+        
+        // Загружаем информацию о пользователе
+        fetch(`/user_info/${target}`)
+            .then(r => r.json())
+            .then(data => {
+                if (data.success) {
+                    const avatar = document.getElementById('chat-header-avatar');
+                    if (data.avatar_path) {
+                        avatar.style.backgroundImage = `url(${data.avatar_path})`;
+                        avatar.textContent = '';
+                    } else {
+                        avatar.style.backgroundColor = data.avatar_color;
+                    }
+                    document.getElementById('chat-subtitle').innerHTML = `<span class="status-dot"></span> ${data.online ? 'Online' : 'Offline'}`;
+                }
+            });
+    }
+    
+    // Обновляем активный элемент в навигации
+    document.querySelectorAll('.nav-item').forEach(item => {
+        item.classList.remove('active');
+    });
+    
+    // Показываем поле ввода
+    document.getElementById('input-area').style.display = 'block';
+    
+    // Загружаем сообщения
+    loadMessages();
+    
+    // Подключаемся к комнате
+    socket.emit('join', { room: currentRoom });
+    
+    // Скрываем сайдбар на мобильных
+    if (isMobile) {
+        document.getElementById('sidebar').classList.remove('active');
+    }
+}
+
+// Открытие избранного
+function openFavorites(e) {
+    if (e) e.preventDefault();
+    currentRoom = "favorites";
+    currentRoomType = "favorites";
+    
+    // Обновляем активный элемент
+    document.querySelectorAll('.nav-item').forEach(item => {
+        item.classList.remove('active');
+    });
+    e.target.closest('.nav-item').classList.add('active');
+    
+    document.getElementById('chat-title').textContent = "Все заметки";
+    document.getElementById('chat-subtitle').textContent = "Ваши сохраненные материалы";
+    document.getElementById('chat-header-avatar').className = 'chat-avatar';
+    document.getElementById('chat-header-avatar').innerHTML = '<i class="fas fa-star"></i>';
+    document.getElementById('chat-header-avatar').style.background = 'linear-gradient(135deg, var(--primary), var(--secondary))';
+    
+    // Скрываем поле ввода
+    document.getElementById('input-area').style.display = 'none';
+    
+    // Загружаем избранное
+    loadFavorites();
+    
+    // Скрываем сайдбар на мобильных
+    if (isMobile) {
+        document.getElementById('sidebar').classList.remove('active');
+    }
+}
+
+// Загрузка избранного
+function loadFavorites() {
+    fetch('/get_favorites')
+        .then(r => r.json())
+        .then(data => {
+            if (data.success) {
+                renderFavorites(data.favorites);
+            }
+        });
+}
+
+function renderFavorites(favorites) {
+    const container = document.getElementById('messages-content');
+    container.innerHTML = '';
+    
+    if (favorites.length === 0) {
+        container.innerHTML = `
+            <div class="empty-state">
+                <i class="fas fa-star"></i>
+                <h3>Пока ничего нет</h3>
+                <p>Добавьте свои заметки, фото или видео</p>
+                <button onclick="addFavorite()" style="margin-top: 16px; padding: 10px 20px; background: var(--primary); color: white; border: none; border-radius: var(--radius-xs); cursor: pointer;">
+                    <i class="fas fa-plus"></i> Добавить заметку
+                </button>
+            </div>
+        `;
+    } else {
+        const grid = document.createElement('div');
+        grid.className = 'favorites-grid';
+        
+        favorites.forEach(favorite => {
+            const item = document.createElement('div');
+            item.className = 'favorite-item';
+            
+            let content = '';
+            if (favorite.content) {
+                content += `<div class="favorite-content">${favorite.content}</div>`;
+            }
+            if (favorite.file_path) {
+                if (favorite.file_type === 'image' || favorite.file_name?.match(/\.(jpg|jpeg|png|gif|webp)$/i)) {
+                    content += `
+                        <div class="favorite-file">
+                            <a href="${favorite.preview || favorite.file_path}" target="_blank"><img src="${favorite.thumbnail || favorite.file_path}" alt="${favorite.file_name}" loading="lazy"></a>
+                        </div>
+                    `;
+                } else if (favorite.file_type === 'video' || favorite.file_name?.match(/\.(mp4|webm|mov)$/i)) {
+                    content += `
+                        <div class="favorite-file">
+                            <video src="${favorite.file_path}" controls></video>
+                        </div>
+                    `;
+                }
+            }
+            
+            const date = new Date(favorite.created_at).toLocaleDateString('ru-RU');
+            const category = favorite.category !== 'general' ? `<span class="category-badge">${favorite.category}</span>` : '';
+            
+            item.innerHTML = `
+                ${content}
+                <div class="favorite-meta">
+                    <span>${date}</span>
+                    ${category}
+                </div>
+            `;
+            grid.appendChild(item);
+        });
+        
+        container.appendChild(grid);
+    }
+    addButtonEffects();
+}
+
+// Загрузка сообщений
+function createMessageElement(msg) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${msg.user === user ? 'own' : 'other'}`;
+    if (msg.id) messageDiv.dataset.id = msg.id;
+    
+    let avatarContent = '';
+    if (msg.avatar_path) {
+        avatarContent = `<div class="message-avatar" style="background-image: url(${msg.avatar_path});"></div>`;
+    } else {
+        avatarContent = `<div class="message-avatar" style="background-color: ${msg.color};">${msg.user.slice(0, 2).toUpperCase()}</div>`;
+    }
+    
+    let fileContent = '';
+    if (msg.file) {
+        if (msg.file.match(/\.(mp4|webm|mov)$/i)) {
+            fileContent = `<div class="message-file"><video src="${msg.file}" controls></video></div>`;
+        } else {
+            // Превью из конвейера вариантов, по клику - WebP-копия или оригинал
+            fileContent = `<div class="message-file"><a href="${msg.preview || msg.file}" target="_blank"><img src="${msg.thumbnail || msg.file}" alt="${msg.file_name || 'Файл'}" loading="lazy"></a></div>`;
+        }
+    }
+    
+    messageDiv.innerHTML = `
+        ${avatarContent}
+        <div class="message-content">
+            <div class="message-sender">${msg.user}</div>
+            <div class="message-text">${msg.message || ''}</div>
+            ${fileContent}
+            <div class="message-time">${msg.timestamp || ''}</div>
+        </div>
+    `;
+    return messageDiv;
+}
+
+function buildMessagesFragment(messages) {
+    const fragment = document.createDocumentFragment();
+    // Группируем сообщения по датам
+    const groupedMessages = {};
+    messages.forEach(msg => {
+        const date = msg.timestamp ? msg.timestamp.split(' ')[0] : new Date().toLocaleDateString();
+        if (!groupedMessages[date]) { groupedMessages[date] = []; }
+        groupedMessages[date].push(msg);
+    });
+    
+    Object.entries(groupedMessages).forEach(([date, msgs]) => {
+        const dateDiv = document.createElement('div');
+        dateDiv.className = 'message-group-date';
+        dateDiv.innerHTML = `<span class="message-date-badge">${date}</span>`;
+        fragment.appendChild(dateDiv);
+        msgs.forEach(msg => fragment.appendChild(createMessageElement(msg)));
+    });
+    return fragment;
+}
+
+function loadMessages() {
+    const room = currentRoom;
+    oldestMessageId = null;
+    hasMoreHistory = false;
+    fetch(`/get_messages/${room}?limit=${HISTORY_PAGE_SIZE}`)
+        .then(r => r.json())
+        .then(messages => {
+            if (room !== currentRoom) return;
+            const container = document.getElementById('messages-content');
+            container.innerHTML = '';
+            
+            if (!messages || messages.length === 0) {
+                container.innerHTML = `
+                    <div class="empty-state">
+                        <i class="fas fa-comments"></i>
+                        <h3>Начните общение</h3>
+                        <p>Отправьте первое сообщение в чат</p>
+                    </div>
+                `;
+            } else {
+                oldestMessageId = messages[0].id;
+                hasMoreHistory = messages.length === HISTORY_PAGE_SIZE;
+                container.appendChild(buildMessagesFragment(messages));
+                markRead(room, messages[messages.length - 1].id);
+                markOwnRead(unreadState[room]?.partner_read_message_id);
+            }
+            
+            // Прокручиваем вниз
+            const scroller = document.getElementById('messages');
+            scroller.scrollTop = scroller.scrollHeight;
+            addButtonEffects();
+        });
+}
+
+// Подгрузка более старых сообщений (курсор before_id)
+function loadOlderMessages() {
+    if (!hasMoreHistory || loadingHistory || oldestMessageId === null || currentRoomType === 'favorites') return;
+    const room = currentRoom;
+    loadingHistory = true;
+    fetch(`/get_messages/${room}?limit=${HISTORY_PAGE_SIZE}&before_id=${oldestMessageId}`)
+        .then(r => r.json())
+        .then(messages => {
+            if (room !== currentRoom || !Array.isArray(messages)) return;
+            hasMoreHistory = messages.length === HISTORY_PAGE_SIZE;
+            if (messages.length === 0) return;
+            oldestMessageId = messages[0].id;
+            const scroller = document.getElementById('messages');
+            const container = document.getElementById('messages-content');
+            const previousHeight = scroller.scrollHeight;
+            container.insertBefore(buildMessagesFragment(messages), container.firstChild);
+            // Сохраняем позицию прокрутки после вставки сверху
+            scroller.scrollTop += scroller.scrollHeight - previousHeight;
+            addButtonEffects();
+        })
+        .finally(() => { loadingHistory = false; });
+}
+
+// Отправка сообщения
+function sendMessage() {
+    const input = document.getElementById('msg-input');
+    const msg = input.value.trim();
+    const fileInput = document.getElementById('file-input');
+    
+    if (!msg && !fileInput.files[0]) return;
+    
+    let fileData = null;
+    let fileName = null;
+    let fileType = null;
+    
+    if (fileInput.files[0]) {
+        uploadInChunks(fileInput.files[0], 'file')
+        .then(data => {
+            if (data.success) {
+                fileData = data.path;
+                fileName = data.filename;
+                fileType = data.file_type;
+                sendSocketMessage(msg, fileData, fileName, fileType);
+            }
+        })
+        .catch(error => console.error('Ошибка загрузки файла:', error));
+    } else {
+        sendSocketMessage(msg);
+    }
+    
+    input.value = '';
+    input.style.height = 'auto';
+    fileInput.value = '';
+}
+
+// Загрузка файла частями (/uploads): после обрыва связи продолжаем с того места,
+// до которого сервер успел записать файл
+const UPLOAD_RETRIES = 5;
+
+async function uploadInChunks(file, purpose) {
+    const init = await fetch('/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, purpose: purpose })
+    }).then(r => r.json());
+    if (!init.success) return init;
+
+    let offset = 0;
+    let failures = 0;
+    while (offset < file.size) {
+        try {
+            const response = await fetch(`/uploads/${init.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: file.slice(offset, offset + init.chunk_size)
+            });
+            const data = await response.json();
+            if (data.offset == null) return data;
+            offset = data.offset;
+            failures = 0;
+        } catch (error) {
+            if (++failures > UPLOAD_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            const status = await fetch(`/uploads/${init.upload_id}`).then(r => r.json()).catch(() => null);
+            if (status && status.success) offset = status.offset;
+        }
+    }
+    return fetch(`/uploads/${init.upload_id}/finalize`, { method: 'POST' }).then(r => r.json());
+}
+
+function sendSocketMessage(msg, file = null, fileName = null, fileType = null) {
+    const messageData = {
+        message: msg,
+        room: currentRoom,
+        type: currentRoomType
+    };
+    if (file) {
+        messageData.file = file;
+        messageData.fileName = fileName;
+        messageData.fileType = fileType;
+    }
+    messageData.client_id = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+    // Подтверждение приходит, когда сообщение записано в БД
+    socket.emit('message', messageData, (ack) => {
+        const element = document.querySelector(`.message[data-client-id="${messageData.client_id}"]`);
+        if (ack && ack.success && element) {
+            element.dataset.id = ack.id;
+        } else if (ack && !ack.success) {
+            if (element) {
+                element.classList.add('failed');
+                element.title = ack.error || 'Сообщение не отправлено';
+            }
+        }
+    });
+}
+
+// Socket события
+socket.on('message', (data) => {
+    if (data.room === currentRoom) {
+        addMessage(data);
+        if (data.user !== user) markRead(data.room);
+    } else if (data.user !== user) {
+        updateUnread(data.room, (unreadState[data.room]?.unread || 0) + 1);
+    }
+});
+
+// Сервер записал курсор прочтения (в том числе из другой вкладки)
+socket.on('unread', (data) => {
+    updateUnread(data.room, data.unread);
+});
+
+socket.on('read_receipt', (data) => {
+    unreadState[data.room] = { ...unreadState[data.room], partner_read_message_id: data.message_id };
+    if (data.room === currentRoom) markOwnRead(data.message_id);
+});
+
+// Изменения онлайн-статусов приходят событием, без опроса /user_info
+socket.on('presence', (data) => {
+    if (currentRoomType === 'private' && currentChannel in data.users) {
+        document.getElementById('chat-subtitle').innerHTML =
+            `<span class="status-dot"></span> ${data.users[currentChannel] ? 'Online' : 'Offline'}`;
+    }
+});
+
+function addMessage(data) {
+    const container = document.getElementById('messages-content');
+    
+    // Убираем пустое состояние
+    const emptyState = container.querySelector('.empty-state');
+    if (emptyState) { emptyState.remove(); }
+    
+    // Добавляем дату если нужно
+    const today = new Date().toLocaleDateString();
+    const lastDate = container.querySelector('.message-group-date:last-child');
+    if (!lastDate || !lastDate.textContent.includes(today)) {
+        const dateDiv = document.createElement('div');
+        dateDiv.className = 'message-group-date';
+        dateDiv.innerHTML = `<span class="message-date-badge">${today}</span>`;
+        container.appendChild(dateDiv);
+    }
+    
+    // Добавляем сообщение
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${data.user === user ? 'own' : 'other'}`;
+    if (data.client_id) messageDiv.dataset.clientId = data.client_id;
+    
+    let avatarContent = '';
+    if (data.avatar_path) {
+        avatarContent = `<div class="message-avatar" style="background-image: url(${data.avatar_path});"></div>`;
+    } else {
+        avatarContent = `<div class="message-avatar" style="background-color: ${data.color || '#6366F1'};">${data.user.slice(0, 2).toUpperCase()}</div>`;
+    }
+    
+    let fileContent = '';
+    if (data.file) {
+        if (data.file.match(/\.(mp4|webm|mov)$/i)) {
+            fileContent = `<div class="message-file"><video src="${data.file}" controls></video></div>`;
+        } else {
+            fileContent = `<div class="message-file"><a href="${data.file}" target="_blank"><img src="${data.file}" alt="${data.fileName || 'Файл'}"></a></div>`;
+        }
+    }
+    
+    messageDiv.innerHTML = `
+        ${avatarContent}
+        <div class="message-content">
+            <div class="message-sender">${data.user}</div>
+            <div class="message-text">${data.message || ''}</div>
+            ${fileContent}
+            <div class="message-time">${data.timestamp || new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}</div>
+        </div>
+    `;
+    container.appendChild(messageDiv);
+    container.scrollTop = container.scrollHeight;
+    
+    // Добавляем анимацию
+    messageDiv.style.animation = 'messageAppear 0.3s cubic-bezier(0.2, 0.8, 0.2, 1)';
+    addButtonEffects();
+}
+
+// Эмодзи
+function initEmojis() {
+    const emojiGrid = document.getElementById('emoji-grid');
+    emojiData.forEach(emoji => {
+        const emojiItem = document.createElement('div');
+        emojiItem.className = 'emoji-item';
+        emojiItem.textContent = emoji;
+        emojiItem.onclick = () => insertEmoji(emoji);
+        emojiGrid.appendChild(emojiItem);
+    });
+    addButtonEffects();
+}
+
+function toggleEmojiPicker() {
+    const picker = document.getElementById('emoji-container');
+    picker.style.display = picker.style.display === 'block' ? 'none' : 'block';
+}
+
+function insertEmoji(emoji) {
+    const input = document.getElementById('msg-input');
+    const start = input.selectionStart;
+    const end = input.selectionEnd;
+    input.value = input.value.substring(0, start) + emoji + input.value.substring(end);
+    input.focus();
+    input.selectionStart = input.selectionEnd = start + emoji.length;
+}
+
+// Функции для модального окна создания канала
+function openCreateChannelModal() {
+    resetCreateChannelForm();
+    openModal('create-channel-modal');
+    addButtonEffects();
+    
+    // Скрываем сайдбар на мобильных
+    if (isMobile) {
+        document.getElementById('sidebar').classList.remove('active');
+    }
+}
+
+function resetCreateChannelForm() {
+    document.getElementById('channel-id').value = '';
+    document.getElementById('channel-name').value = '';
+    document.getElementById('channel-description').value = '';
+    document.getElementById('channel-avatar-preview').style.display = 'none';
+    document.getElementById('channel-avatar-preview').src = '';
+    document.getElementById('channel-avatar-input').value = '';
+    
+    // Сбросить статусы проверки
+    document.getElementById('id-available').style.display = 'none';
+    document.getElementById('id-taken').style.display = 'none';
+    
+    // Сбросить ошибки
+    hideAllErrors();
+    
+    // Установить публичный по умолчанию
+    setPrivacy(false);
+}
+
+function formatChannelId(input) {
+    // Форматирование ID канала: только строчные буквы, цифры и подчеркивания
+    let value = input.value.toLowerCase();
+    value = value.replace(/[^a-z0-9_]/g, '');
+    input.value = value;
+    
+    // Скрыть статусы при изменении
+    document.getElementById('id-available').style.display = 'none';
+    document.getElementById('id-taken').style.display = 'none';
+}
+
+function checkChannelId() {
+    const channelId = document.getElementById('channel-id').value.trim();
+    const checkBtn = document.getElementById('check-id-btn');
+    
+    if (!channelId) {
+        showError('channel-id-error', 'Введите ID канала');
+        return;
+    }
+    
+    if (channelId.length < 2) {
+        showError('channel-id-error', 'ID должен содержать не менее 2 символов');
+        return;
+    }
+    
+    // Показать состояние загрузки
+    checkBtn.classList.add('loading');
+    checkBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Проверка...';
+    
+    fetch(`/check_channel_id/${encodeURIComponent(channelId)}`)
+        .then(r => r.json())
+        .then(data => {
+            checkBtn.classList.remove('loading');
+            checkBtn.innerHTML = 'Проверить';
+            
+            if (data.success) {
+                if (data.available) {
+                    document.getElementById('id-available').style.display = 'block';
+                    document.getElementById('id-taken').style.display = 'none';
+                    hideError('channel-id-error');
+                } else {
+                    document.getElementById('id-available').style.display = 'none';
+                    document.getElementById('id-taken').style.display = 'block';
+                    showError('channel-id-error', 'Этот ID уже занят');
+                }
+            } else {
+                showError('channel-id-error', 'Ошибка проверки ID');
+            }
+        })
+        .catch(error => {
+            checkBtn.classList.remove('loading');
+            checkBtn.innerHTML = 'Проверить';
+            showError('channel-id-error', 'Ошибка соединения');
+        });
+}
+
+function setPrivacy(isPrivate) {
+    const options = document.querySelectorAll('.privacy-option');
+    options.forEach(option => option.classList.remove('active'));
+    
+    if (isPrivate) {
+        options[1].classList.add('active');
+    } else {
+        options[0].classList.add('active');
+    }
+}
+
+function previewChannelAvatar(input) {
+    const file = input.files[0];
+    if (file) {
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            const preview = document.getElementById('channel-avatar-preview');
+            preview.src = e.target.result;
+            preview.style.display = 'block';
+        };
+        reader.readAsDataURL(file);
+    }
+}
+
+function createChannel() {
+    // Сбросить ошибки
+    hideAllErrors();
+    
+    const channelId = document.getElementById('channel-id').value.trim();
+    const channelName = document.getElementById('channel-name').value.trim();
+    const channelDescription = document.getElementById('channel-description').value.trim();
+    const avatarFile = document.getElementById('channel-avatar-input').files[0];
+    const isPrivate = document.querySelector('.privacy-option:nth-child(2)').classList.contains('active');
+    const createBtn = document.getElementById('create-channel-btn');
+    
+    // Валидация
+    let hasError = false;
+    
+    if (!channelId) {
+        showError('channel-id-error', 'Введите ID канала');
+        hasError = true;
+    }
+    
+    if (channelId.length < 2) {
+        showError('channel-id-error', 'ID должен содержать не менее 2 символов');
+        hasError = true;
+    }
+    
+    if (!channelName) {
+        showError('channel-name-error', 'Введите название канала');
+        hasError = true;
+    }
+    
+    if (channelName.length > 50) {
+        showError('channel-name-error', 'Название должно быть не более 50 символов');
+        hasError = true;
+    }
+    
+    if (hasError) return;
+    
+    // Проверить доступность ID
+    fetch(`/check_channel_id/${encodeURIComponent(channelId)}`)
+        .then(r => r.json())
+        .then(data => {
+            if (!data.success || !data.available) {
+                showError('channel-id-error', 'Этот ID уже занят');
+                return;
+            }
+            
+            // Все проверки пройдены, создаем канал
+            submitChannelCreation(channelId, channelName, channelDescription, avatarFile, isPrivate, createBtn);
+        })
+        .catch(error => {
+            showError('channel-id-error', 'Ошибка проверки ID');
+        });
+}
+
+function submitChannelCreation(channelId, channelName, channelDescription, avatarFile, isPrivate, createBtn) {
+    // Показать состояние загрузки
+    createBtn.classList.add('loading');
+    createBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Создание...';
+    
+    const formData = new FormData();
+    formData.append('channel_id', channelId);
+    formData.append('display_name', channelName);
+    formData.append('description', channelDescription);
+    formData.append('is_private', isPrivate);
+    
+    if (avatarFile) {
+        formData.append('avatar', avatarFile);
+    }
+    
+    fetch('/create_channel', {
+        method: 'POST',
+        body: formData
+    })
+    .then(r => r.json())
+    .then(data => {
+        createBtn.classList.remove('loading');
+        createBtn.innerHTML = '<i class="fas fa-plus"></i> Создать канал';
+        
+        if (data.success) {
+            // Закрыть модальное окно
+            closeModal('create-channel-modal');
+            
+            // Обновить список каналов
+            loadChannels();
+            
+            // Открыть созданный канал
+            openChat(data.channel_id, 'channel', data.display_name);
+            
+            // Показать уведомление
+            showNotification('Канал успешно создан!', 'success');
+        } else {
+            showError('channel-id-error', data.error || 'Ошибка при создании канала');
+        }
+    })
+    .catch(error => {
+        createBtn.classList.remove('loading');
+        createBtn.innerHTML = '<i class="fas fa-plus"></i> Создать канал';
+        showError('channel-id-error', 'Ошибка соединения с сервером');
+    });
+}
+
+function showNotification(message, type = 'success') {
+    // Создать элемент уведомления
+    const notification = document.createElement('div');
+    notification.className = `notification notification-${type}`;
+    notification.style.cssText = `
+        position: fixed; top: 20px; right: 20px;
+        background: var(--bg-light); border: 1px solid var(--border);
+        border-radius: var(--radius-sm); padding: 16px;
+        box-shadow: var(--shadow); z-index: 3000;
+        animation: slideInRight 0.3s ease;
+        max-width: 300px;
+    `;
+    
+    if (type === 'success') {
+        notification.style.borderLeft = '4px solid var(--accent)';
+    } else {
+        notification.style.borderLeft = '4px solid #ef4444';
+    }
+    
+    notification.innerHTML = `
+        <div style="display: flex; align-items: center; gap: 12px;">
+            <i class="fas fa-${type === 'success' ? 'check-circle' : 'exclamation-circle'}" 
+               style="color: ${type === 'success' ? 'var(--accent)' : '#ef4444'}; font-size: 1.2rem;"></i>
+            <div style="flex: 1;">${message}</div>
+        </div>
+    `;
+    
+    document.body.appendChild(notification);
+    
+    // Удалить уведомление через 3 секунды
+    setTimeout(() => {
+        notification.style.animation = 'slideOutRight 0.3s ease';
+        setTimeout(() => notification.remove(), 300);
+    }, 3000);
+}
+
+// Вспомогательные функции для ошибок
+function showError(elementId, message) {
+    const element = document.getElementById(elementId);
+    element.textContent = message;
+    element.style.display = 'block';
+}
+
+function hideError(elementId) {
+    document.getElementById(elementId).style.display = 'none';
+}
+
+function hideAllErrors() {
+    document.querySelectorAll('.error-message').forEach(el => {
+        el.style.display = 'none';
+    });
+}
+
+// Модальные окна
+function openModal(id) {
+    const modal = document.getElementById(id);
+    modal.style.display = 'flex';
+    setTimeout(() => {
+        modal.classList.add('active');
+    }, 10);
+    addButtonEffects();
+}
+
+function closeModal(id) {
+    const modal = document.getElementById(id);
+    modal.classList.remove('active');
+    setTimeout(() => {
+        modal.style.display = 'none';
+    }, 300);
+}
+
+function openUserProfile(username) {
+    fetch(`/user_info/${username}`)
+        .then(r => r.json())
+        .then(data => {
+            if (data.success) {
+                document.getElementById('modal-username').textContent = username;
+                document.getElementById('modal-user-description').textContent = data.profile_description || 'Нет описания';
+                const avatar = document.getElementById('modal-user-avatar');
+                if (data.avatar_path) {
+                    avatar.style.backgroundImage = `url(${data.avatar_path})`;
+                    avatar.textContent = '';
+                } else {
+                    avatar.style.backgroundColor = data.avatar_color;
+                    avatar.textContent = username.slice(0, 2).toUpperCase();
+                }
+                openModal('profile-modal');
+            }
+        });
+}
+
+function openSettings() {
+    openModal('settings-modal');
+}
+
+function saveSettings() {
+    const theme = document.getElementById('theme-select').value;
+    fetch('/set_theme', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ theme: theme })
+    })
+    .then(r => r.json())
+    .then(data => {
+        if (data.success) {
+            document.documentElement.setAttribute('data-theme', theme);
+            closeModal('settings-modal');
+            showNotification('Настройки сохранены', 'success');
+        }
+    });
+}
+
+function openSupport() {
+    currentRoom = "support";
+    currentRoomType = "support";
+    document.getElementById('chat-title').textContent = "Поддержка";
+    document.getElementById('chat-subtitle').textContent = "Мы всегда готовы помочь";
+    document.getElementById('chat-header-avatar').className = 'chat-avatar';
+    document.getElementById('chat-header-avatar').innerHTML = '<i class="fas fa-headset"></i>';
+    document.getElementById('chat-header-avatar').style.background = 'linear-gradient(135deg, var(--primary), var(--secondary))';
+    document.getElementById('input-area').style.display = 'none';
+    
+    const container = document.getElementById('messages-content');
+    container.innerHTML = `
+        <div style="padding: 20px;">
+            <h3 style="margin-bottom: 16px;">Центр поддержки AURA</h3>
+            <div style="background: var(--glass-bg); border: 1px solid var(--glass-border); border-radius: var(--radius); padding: 20px; margin-bottom: 16px;">
+                <h4 style="margin-bottom: 8px;">Частые вопросы</h4>
+                <p style="color: var(--text-light); margin-bottom: 12px;">Здесь вы найдете ответы на самые популярные вопросы о работе AURA Messenger.</p>
+                <button onclick="alert('FAQ будет реализован в будущем')" style="padding: 8px 16px; background: var(--primary); color: white; border: none; border-radius: var(--radius-xs); cursor: pointer;">
+                    Открыть FAQ
+                </button>
+            </div>
+            <div style="background: var(--glass-bg); border: 1px solid var(--glass-border); border-radius: var(--radius); padding: 20px;">
+                <h4 style="margin-bottom: 8px;">Связаться с нами</h4>
+                <p style="color: var(--text-light); margin-bottom: 12px;">По всем вопросам и предложениям:</p>
+                <a href="https://vk.com/rsaltyyt" target="_blank" style="color: var(--primary); text-decoration: none;">https://vk.com/rsaltyyt</a>
+            </div>
+        </div>
+    `;
+    
+    if (isMobile) {
+        document.getElementById('sidebar').classList.remove('active');
+    }
+    addButtonEffects();
+}
+
+function logout() {
+    if (confirm('Вы уверены, что хотите выйти?')) {
+        window.location.href = '/logout';
+    }
+}
+
+// Закрытие модальных окон и выпадающих списков при клике вне
+document.addEventListener('click', function(event) {
+    // Закрытие поиска
+    const searchResults = document.getElementById('search-results');
+    const searchInput = document.getElementById('search-input');
+    if (searchResults.style.display === 'block' && !searchResults.contains(event.target) && !searchInput.contains(event.target)) {
+        searchResults.style.display = 'none';
+    }
+    
+    // Закрытие эмодзи пикера
+    const emojiContainer = document.getElementById('emoji-container');
+    if (emojiContainer.style.display === 'block' && !emojiContainer.contains(event.target) && !event.target.closest('.input-action-btn')) {
+        emojiContainer.style.display = 'none';
+    }
+    
+    // Закрытие модальных окон при клике вне контента
+    const modals = document.querySelectorAll('.modal-overlay');
+    modals.forEach(modal => {
+        if (modal.classList.contains('active') && !modal.querySelector('.modal-content').contains(event.target)) {
+            closeModal(modal.id);
+        }
+    });
+});
+
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        document.getElementById('search-results').style.display = 'none';
+        document.getElementById('emoji-container').style.display = 'none';
+        
+        const modals = document.querySelectorAll('.modal-overlay');
+        modals.forEach(modal => {
+            if (modal.classList.contains('active')) {
+                closeModal(modal.id);
+            }
+        });
+    }
+});
+
+// Добавить CSS для анимаций уведомлений
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideInRight {
+        from { transform: translateX(100%); opacity: 0; }
+        to { transform: translateX(0); opacity: 1; }
+    }
+    @keyframes slideOutRight {
+        from { transform: translateX(0); opacity: 1; }
+        to { transform: translateX(100%); opacity: 0; }
+    }
+`;
+document.head.appendChild(style);
@@ -0,0 +1,127 @@
+let isLoading = false;
+function showAlert(message, type = 'error') {
+    const alert = document.getElementById('alert');
+    alert.textContent = message;
+    alert.className = `alert alert-${type}`;
+    alert.style.display = 'block';
+    setTimeout(() => { alert.style.display = 'none'; }, 5000);
+}
+function showTab(tabName) {
+    if (isLoading) return;
+    document.querySelectorAll('.auth-tab').forEach(tab => tab.classList.remove('active'));
+    document.querySelectorAll('.auth-form').forEach(form => form.classList.remove('active'));
+    document.querySelector(`.auth-tab[onclick="showTab('${tabName}')"]`).classList.add('active');
+    document.getElementById(`${tabName}-form`).classList.add('active');
+}
+function togglePassword(inputId) {
+    const input = document.getElementById(inputId);
+    const button = input.nextElementSibling;
+    const icon = button.querySelector('i');
+    if (input.type === 'password') {
+        input.type = 'text';
+        icon.className = 'fas fa-eye-slash';
+    } else {
+        input.type = 'password';
+        icon.className = 'fas fa-eye';
+    }
+}
+function setLoading(buttonId, loading) {
+    isLoading = loading;
+    const button = document.getElementById(buttonId);
+    const icon = button.querySelector('i');
+    if (loading) {
+        button.disabled = true;
+        button.innerHTML = '<div class="loader"></div> Загрузка...';
+    } else {
+        button.disabled = false;
+        if (buttonId === 'login-btn') {
+            button.innerHTML = '<i class="fas fa-sign-in-alt"></i> Войти в аккаунт';
+        } else {
+            button.innerHTML = '<i class="fas fa-user-plus"></i> Создать аккаунт';
+        }
+    }
+}
+async function login() {
+    if (isLoading) return;
+    const username = document.getElementById('login-username').value.trim();
+    const password = document.getElementById('login-password').value;
+    if (!username || !password) { return showAlert('Заполните все поля'); }
+    setLoading('login-btn', true);
+    try {
+        const response = await fetch('/login', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+            body: new URLSearchParams({ username, password })
+        });
+        const data = await response.json();
+        if (data.success) {
+            showAlert('Успешный вход! Перенаправляем...', 'success');
+            setTimeout(() => { window.location.href = '/chat'; }, 1000);
+        } else {
+            showAlert(data.error || 'Неверный логин или пароль');
+        }
+    } catch (error) {
+        showAlert('Ошибка соединения. Проверьте интернет');
+        console.error('Login error:', error);
+    } finally {
+        setLoading('login-btn', false);
+    }
+}
+async function register() {
+    if (isLoading) return;
+    const username = document.getElementById('register-username').value.trim();
+    const password = document.getElementById('register-password').value;
+    const confirm = document.getElementById('register-confirm').value;
+    if (!username || !password || !confirm) { return showAlert('Заполните все поля'); }
+    if (username.length < 3) { return showAlert('Логин должен быть не менее 3 символов'); }
+    if (username.length > 20) { return showAlert('Логин должен быть не более 20 символов'); }
+    if (password.length < 4) { return showAlert('Пароль должен быть не менее 4 символов'); }
+    if (password !== confirm) { return showAlert('Пароли не совпадают'); }
+    setLoading('register-btn', true);
+    try {
+        const response = await fetch('/register', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+            body: new URLSearchParams({ username, password })
+        });
+        const data = await response.json();
+        if (data.success) {
+            showAlert('Аккаунт создан! Входим...', 'success');
+            setTimeout(async () => {
+                try {
+                    const loginResponse = await fetch('/login', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+                        body: new URLSearchParams({ username, password })
+                    });
+                    const loginData = await loginResponse.json();
+                    if (loginData.success) {
+                        window.location.href = '/chat';
+                    } else {
+                        showAlert('Автоматический вход не удался. Войдите вручную.');
+                        showTab('login');
+                    }
+                } catch (error) {
+                    showAlert('Ошибка автоматического входа. Войдите вручную.');
+                    showTab('login');
+                }
+            }, 1500);
+        } else {
+            showAlert(data.error || 'Ошибка регистрации');
+        }
+    } catch (error) {
+        showAlert('Ошибка соединения. Проверьте интернет');
+        console.error('Register error:', error);
+    } finally {
+        setLoading('register-btn', false);
+    }
+}
+function openTermsModal() { alert('Условия использования - демо версия'); }
+function openPrivacyModal() { alert('Политика конфиденциальности - демо версия'); }
+document.addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+        const activeForm = document.querySelector('.auth-form.active');
+        if (activeForm.id === 'login-form') login();
+        if (activeForm.id === 'register-form') register();
+    }
+});
@@ -0,0 +1,762 @@
+# storage.py - репозитории данных AURA Messenger
+#
+# Весь SQL приложения живет здесь. Запросы пишутся в диалекте SQLite, для
+# PostgreSQL их переводит db.translate_sql, поэтому один и тот же репозиторий
+# работает поверх любого движка из db.create_database.
+
+import re
+import time
+
+# Границы совпадения в сниппетах поиска: подсветку в HTML делает вызывающий код
+# уже после экранирования текста
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SEARCH_TOKEN = re.compile(r'\w+', re.U)
+
+USER_FIELDS = ['username', 'online', 'color', 'avatar', 'theme', 'profile_description']
+CHANNEL_FIELDS = ['name', 'display_name', 'description', 'is_private', 'allow_messages', 'created_by',
+                  'avatar_path', 'subscriber_count']
+MESSAGE_COLUMNS = '''
+    m.id, m.username, m.message, m.message_type, m.file_path, m.file_name, m.timestamp,
+    u.avatar_color, u.avatar_path
+'''
+
+
+def _timestamp(value):
+    # SQLite отдает строку, PostgreSQL - datetime; дальше везде используется строка
+    if value is None or isinstance(value, str):
+        return value
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _public_user(row):
+    user = dict(zip(USER_FIELDS, row))
+    user['profile_description'] = user['profile_description'] or ''
+    return user
+
+
+def _channel(row):
+    channel = dict(zip(CHANNEL_FIELDS, row))
+    channel['subscriber_count'] = channel['subscriber_count'] or 0
+    return channel
+
+
+def adjust_media_refs(c, paths, delta):
+    # Счетчики ссылок на файлы хранилища media меняются в той же транзакции,
+    # что и строки, которые на них ссылаются; пути вне хранилища не совпадут ни с чем
+    for path in paths:
+        if path:
+            c.execute('UPDATE media SET refcount = refcount + ?, updated_at = ? WHERE path = ?',
+                      (delta, int(time.time()), path))
+
+
+def bump_version(c, scope):
+    # Версия scope (см. миграцию 9) растет в той же транзакции, что и изменение
+    c.execute('INSERT OR IGNORE INTO change_versions (scope, version) VALUES (?, 0)', (scope,))
+    c.execute('UPDATE change_versions SET version = version + 1 WHERE scope = ?', (scope,))
+
+
+def update_conversations(c, messages, ids):
+    # Строки conversations обоих участников личной переписки меняются в той же
+    # транзакции, что и вставка сообщений; пачка сворачивается в одну строку на участника
+    updates = {}
+    for message, message_id in zip(messages, ids):
+        recipient = message.get('recipient')
+        if not recipient or not message['room'].startswith('private_'):
+            continue
+        updates[(message['username'], message['room'])] = (recipient, message_id)
+        if recipient != message['username']:
+            updates[(recipient, message['room'])] = (message['username'], message_id)
+    for (username, room), (partner, last_id) in updates.items():
+        c.execute('''
+            INSERT INTO conversations (username, room, partner, last_message_id, last_activity)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (username, room) DO UPDATE SET
+                last_message_id = excluded.last_message_id,
+                last_activity = excluded.last_activity
+        ''', (username, room, partner, last_id))
+
+
+def assign_sequences(c, messages):
+    # Номера сообщений в комнатах (messages.seq) для пачки. Счетчик увеличивается до
+    # чтения: в PostgreSQL блокировка строки room_state упорядочивает параллельные пачки
+    counts = {}
+    for message in messages:
+        counts[message['room']] = counts.get(message['room'], 0) + 1
+    last = {}
+    for room, count in counts.items():
+        c.execute('INSERT OR IGNORE INTO room_state (room, seq) VALUES (?, 0)', (room,))
+        c.execute('UPDATE room_state SET seq = seq + ? WHERE room = ?', (count, room))
+        c.execute('SELECT seq FROM room_state WHERE room = ?', (room,))
+        last[room] = c.fetchone()[0] - count
+    seqs = []
+    for message in messages:
+        last[message['room']] += 1
+        seqs.append(last[message['room']])
+    return seqs
+
+
+def advance_cursor(c, username, room, message_id, seq):
+    # Курсор двигается только вперед; True, если он изменился
+    c.execute('''
+        INSERT INTO read_cursors (username, room, last_read_message_id, read_seq, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (username, room) DO UPDATE SET
+            last_read_message_id = excluded.last_read_message_id,
+            read_seq = excluded.read_seq,
+            updated_at = excluded.updated_at
+        WHERE read_cursors.read_seq < excluded.read_seq
+    ''', (username, room, message_id, seq))
+    return c.rowcount > 0
+
+
+def start_channel_cursor(c, username, channel_id):
+    # Новый участник канала начинает с прочитанной истории, а не со всех сообщений
+    c.execute('''
+        INSERT OR IGNORE INTO read_cursors (username, room, last_read_message_id, read_seq)
+        SELECT ?, r.room, r.last_message_id, r.seq
+        FROM channels ch JOIN room_state r ON r.room = 'channel_' || ch.name
+        WHERE ch.id = ?
+    ''', (username, channel_id))
+
+
+def update_room_state(c, messages, ids, seqs):
+    # Последнее сообщение комнаты и курсоры авторов: свои сообщения непрочитанными не бывают
+    rooms, authors = {}, {}
+    for message, message_id, seq in zip(messages, ids, seqs):
+        rooms[message['room']] = message_id
+        authors[(message['username'], message['room'])] = (message_id, seq)
+    for room, message_id in rooms.items():
+        c.execute('UPDATE room_state SET last_message_id = ? WHERE room = ?', (message_id, room))
+    for (username, room), (message_id, seq) in authors.items():
+        advance_cursor(c, username, room, message_id, seq)
+
+
+def refresh_online(c, usernames):
+    # users.is_online - онлайн ли пользователь хотя бы на одном воркере
+    for username in usernames:
+        c.execute('''
+            UPDATE users SET is_online = EXISTS (SELECT 1 FROM presence p WHERE p.username = users.username)
+            WHERE username = ?
+        ''', (username,))
+
+
+class Repository:
+    def __init__(self, db):
+        self.db = db
+
+    def _one(self, sql, params=()):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute(sql, params)
+            return c.fetchone()
+
+    def _all(self, sql, params=()):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute(sql, params)
+            return c.fetchall()
+
+
+# === Пользователи ===
+class UserRepository(Repository):
+    def get(self, username):
+        row = self._one('''
+            SELECT id, username, password_hash, created_at, is_online, avatar_color, avatar_path, theme,
+                   profile_description
+            FROM users WHERE username = ?
+        ''', (username,))
+        if row:
+            return {
+                'id': row[0],
+                'username': row[1],
+                'password_hash': row[2],
+                'created_at': _timestamp(row[3]),
+                'is_online': row[4],
+                'avatar_color': row[5],
+                'avatar_path': row[6],
+                'theme': row[7],
+                'profile_description': row[8] or ''
+            }
+        return None
+
+    def list_all(self):
+        rows = self._all('SELECT username, is_online, avatar_color, avatar_path, theme, profile_description FROM users ORDER BY username')
+        return [_public_user(row) for row in rows]
+
+    def get_many(self, usernames):
+        # Публичные профили по списку имен одним запросом
+        usernames = sorted(set(usernames))
+        if not usernames:
+            return []
+        rows = self._all(f'''
+            SELECT username, is_online, avatar_color, avatar_path, theme, profile_description
+            FROM users WHERE username IN ({', '.join('?' for _ in usernames)}) ORDER BY username
+        ''', usernames)
+        return [_public_user(row) for row in rows]
+
+    def list_except(self, username):
+        return [row[0] for row in self._all('SELECT username FROM users WHERE username != ? ORDER BY username', (username,))]
+
+    def search_documents(self):
+        # Поля для индекса поиска (search_index.SearchIndex)
+        return [(row[0], [row[0]]) for row in self._all('SELECT username FROM users')]
+
+    def create(self, username, password_hash, avatar_color):
+        def write(conn):
+            c = conn.cursor()
+            # Проверяем, существует ли пользователь
+            c.execute('SELECT id FROM users WHERE username = ?', (username,))
+            if c.fetchone():
+                return False
+
+            # Создаем пользователя
+            c.execute('INSERT INTO users (username, password_hash, avatar_color) VALUES (?, ?, ?)',
+                      (username, password_hash, avatar_color))
+
+            # Добавляем пользователя в общий канал и обновляем счетчик подписчиков
+            c.execute("INSERT OR IGNORE INTO channel_members (channel_id, username) SELECT id, ? FROM channels WHERE name = 'general'",
+                      (username,))
+            c.execute("UPDATE channels SET subscriber_count = subscriber_count + 1 WHERE name = 'general'")
+            c.execute("SELECT id FROM channels WHERE name = 'general'")
+            general = c.fetchone()
+            if general:
+                start_channel_cursor(c, username, general[0])
+            return True
+        return self.db.write(write)
+
+    def _update(self, sql, params):
+        return self.db.execute_write(sql, params).rowcount > 0
+
+    def set_online_many(self, worker, statuses):
+        # Пачка изменений статусов воркера {username: online} одной транзакцией; офлайн
+        # на одном воркере не снимает статус, пока пользователь подключен к другому
+        def write(conn):
+            c = conn.cursor()
+            now = int(time.time())
+            for username, online in statuses.items():
+                if online:
+                    c.execute('''
+                        INSERT INTO presence (username, worker, updated_at) VALUES (?, ?, ?)
+                        ON CONFLICT (username, worker) DO UPDATE SET updated_at = excluded.updated_at
+                    ''', (username, worker, now))
+                else:
+                    c.execute('DELETE FROM presence WHERE username = ? AND worker = ?', (username, worker))
+            refresh_online(c, statuses)
+        return self.db.write(write)
+
+    def touch_online(self, worker, expire_before):
+        # Продлевает строки воркера и удаляет строки воркеров, не продлевавших их
+        # с expire_before (упали, не успев сбросить статусы); возвращает их пользователей
+        def write(conn):
+            c = conn.cursor()
+            c.execute('UPDATE presence SET updated_at = ? WHERE worker = ?', (int(time.time()), worker))
+            c.execute('SELECT DISTINCT username FROM presence WHERE updated_at < ?', (expire_before,))
+            stale = [row[0] for row in c.fetchall()]
+            if stale:
+                c.execute('DELETE FROM presence WHERE updated_at < ?', (expire_before,))
+                refresh_online(c, stale)
+            return stale
+        return self.db.write(write)
+
+    def online_elsewhere(self, worker, usernames):
+        # Кто из пользователей подключен к другим воркерам
+        usernames = sorted(set(usernames))
+        if not usernames:
+            return set()
+        rows = self._all(f'''
+            SELECT DISTINCT username FROM presence
+            WHERE worker != ? AND username IN ({', '.join('?' for _ in usernames)})
+        ''', [worker] + usernames)
+        return {row[0] for row in rows}
+
+    def reset_online(self):
+        # После рестарта единственного процесса соединений нет: статусы, оставшиеся
+        # от прошлого запуска, неверны
+        def write(conn):
+            c = conn.cursor()
+            c.execute('DELETE FROM presence')
+            c.execute('UPDATE users SET is_online = ? WHERE is_online', (False,))
+            return c.rowcount
+        return self.db.write(write)
+
+    def set_profile_description(self, username, description):
+        return self._update('UPDATE users SET profile_description = ? WHERE username = ?', (description, username))
+
+    def set_avatar(self, username, avatar_path):
+        def write(conn):
+            c = conn.cursor()
+            c.execute('SELECT avatar_path FROM users WHERE username = ?', (username,))
+            row = c.fetchone()
+            if not row:
+                return False
+            c.execute('UPDATE users SET avatar_path = ? WHERE username = ?', (avatar_path, username))
+            if row[0] != avatar_path:
+                adjust_media_refs(c, [avatar_path], 1)
+                adjust_media_refs(c, [row[0]], -1)
+                bump_version(c, 'avatars')
+            return True
+        return self.db.write(write)
+
+    def set_theme(self, username, theme):
+        return self._update('UPDATE users SET theme = ? WHERE username = ?', (theme, username))
+
+
+# === Сообщения ===
+class MessageRepository(Repository):
+    def save_many(self, messages):
+        # Пачка сообщений одной транзакцией; id возвращаются в порядке пачки
+        def write(conn):
+            c = conn.cursor()
+            seqs = assign_sequences(c, messages)
+            ids = [self.db.insert(c, '''
+                INSERT INTO messages (username, message, room, recipient, message_type, file_path, file_name, is_favorite,
+                                      seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (m['username'], m['message'], m['room'], m.get('recipient'), m.get('message_type', 'text'),
+                  m.get('file_path'), m.get('file_name'), bool(m.get('is_favorite')), seq))
+                   for m, seq in zip(messages, seqs)]
+            adjust_media_refs(c, [m.get('file_path') for m in messages], 1)
+            update_conversations(c, messages, ids)
+            update_room_state(c, messages, ids, seqs)
+            return ids
+        return self.db.write(write)
+
+    def page(self, room, limit=50, before_id=None, after_id=None):
+        # Keyset-пагинация по (room, id): по умолчанию последние limit сообщений,
+        # before_id - страница старше курсора, after_id - новые сообщения после курсора
+        if after_id is not None:
+            rows = self._all(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages m
+                LEFT JOIN users u ON u.username = m.username
+                WHERE m.room = ? AND m.id > ?
+                ORDER BY m.id ASC LIMIT ?
+            ''', (room, after_id, limit))
+        else:
+            rows = self._all(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM messages m
+                LEFT JOIN users u ON u.username = m.username
+                WHERE m.room = ? AND m.id < ?
+                ORDER BY m.id DESC LIMIT ?
+            ''', (room, before_id if before_id is not None else 2 ** 63 - 1, limit))[::-1]
+        messages = []
+        for row in rows:
+            timestamp = _timestamp(row[6])
+            messages.append({
+                'id': row[0],
+                'user': row[1],
+                'message': row[2],
+                'type': row[3],
+                'file': row[4],
+                'file_name': row[5],
+                'timestamp': timestamp[11:16] if timestamp else '',
+                'color': row[7] or '#6366F1',
+                'avatar_path': row[8]
+            })
+        return messages
+
+    def room_version(self, room):
+        # Валидатор страниц комнаты без выборки сообщений: сообщения не меняются, поэтому
+        # страница зависит только от последнего сообщения комнаты и версий аватаров и
+        # вариантов изображений. Один запрос по первичным ключам
+        return tuple(self._one('''
+            SELECT r.last_message_id, r.seq,
+                   (SELECT version FROM change_versions WHERE scope = 'avatars'),
+                   (SELECT version FROM change_versions WHERE scope = 'variants')
+            FROM (SELECT ? AS room) q
+            LEFT JOIN room_state r ON r.room = q.room
+        ''', (room,)))
+
+    def _visible_rooms_clause(self):
+        # Комнаты каналов, где пользователь состоит, и его личные переписки
+        return '''
+            (m.room IN (SELECT 'channel_' || c.name FROM channels c
+                        JOIN channel_members cm ON cm.channel_id = c.id WHERE cm.username = ?)
+             OR (m.room LIKE 'private_%' AND (m.username = ? OR m.recipient = ?)))
+        '''
+
+    def search(self, username, query, room=None, limit=20, offset=0, before_id=None, rank_window=2000):
+        # Поиск по тексту сообщений в видимых пользователю комнатах.
+        # before_id - лента по убыванию id (keyset, годится для глубокой прокрутки),
+        # иначе - по релевантности со смещением offset среди rank_window самых
+        # свежих совпадений: так стоимость не растет с размером таблицы
+        tokens = SEARCH_TOKEN.findall(query.lower())
+        if not tokens:
+            return []
+        scope_params = [username, username, username]
+        scope = self._visible_rooms_clause()
+        if room:
+            scope += ' AND m.room = ?'
+            scope_params.append(room)
+        params = list(scope_params)
+        if self.db.dialect == 'postgres':
+            match = ' & '.join(tokens[:-1] + [tokens[-1] + ':*'])
+            sql = f'''
+                SELECT m.id, m.username, m.room, m.timestamp,
+                       ts_headline('simple', m.message, q, 'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=24, MinWords=8')
+                FROM messages m, to_tsquery('simple', ?) q
+                WHERE to_tsvector('simple', COALESCE(m.message, '')) @@ q AND {scope}
+            '''
+            params.insert(0, match)
+            id_column = 'm.id'
+            order = "ts_rank(to_tsvector('simple', COALESCE(m.message, '')), q) DESC, m.id DESC"
+        else:
+            # Каждый токен - строка в кавычках (без синтаксиса FTS5), последний - префикс
+            match = ' '.join(f'"{token}"' for token in tokens) + '*'
+            sql = f'''
+                SELECT m.id, m.username, m.room, m.timestamp,
+                       snippet(messages_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16)
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND {scope}
+            '''
+            params.insert(0, match)
+            # По rowid FTS5 отдает совпадения сразу в нужном порядке, без сортировки
+            id_column = 'messages_fts.rowid'
+            order = 'messages_fts.rank, m.id DESC'
+            if before_id is None:
+                sql += f'''
+                    AND messages_fts.rowid >= COALESCE((SELECT MIN(id) FROM (
+                        SELECT messages_fts.rowid AS id FROM messages_fts
+                        JOIN messages m ON m.id = messages_fts.rowid
+                        WHERE messages_fts MATCH ? AND {scope}
+                        ORDER BY messages_fts.rowid DESC LIMIT ?
+                    )), 0)
+                '''
+                params += [match] + scope_params + [rank_window]
+        if before_id is not None:
+            sql += f' AND {id_column} < ? ORDER BY {id_column} DESC LIMIT ?'
+            params += [before_id, limit]
+        else:
+            sql += f' ORDER BY {order} LIMIT ? OFFSET ?'
+            params += [limit, offset]
+        return [{
+            'id': row[0],
+            'user': row[1],
+            'room': row[2],
+            'timestamp': _timestamp(row[3]),
+            'snippet': row[4] or ''
+        } for row in self._all(sql, params)]
+
+
+# === Каналы ===
+class ChannelRepository(Repository):
+    def create(self, name, display_name, description, created_by, is_private=False, avatar_path=None):
+        def write(conn):
+            c = conn.cursor()
+            # Проверяем, существует ли канал
+            c.execute('SELECT id FROM channels WHERE name = ?', (name,))
+            if c.fetchone():
+                return None
+
+            # Создаем канал и добавляем создателя как администратора
+            channel_id = self.db.insert(c, '''
+                INSERT INTO channels (name, display_name, description, created_by, is_private, avatar_path)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (name, display_name or name, description or '', created_by, bool(is_private), avatar_path))
+            c.execute('INSERT INTO channel_members (channel_id, username, is_admin) VALUES (?, ?, ?)',
+                      (channel_id, created_by, True))
+            adjust_media_refs(c, [avatar_path], 1)
+            return channel_id
+        return self.db.write(write)
+
+    def get(self, name):
+        row = self._one('''
+            SELECT id, name, display_name, description, created_by, is_private, allow_messages, avatar_path,
+                   subscriber_count
+            FROM channels WHERE name = ?
+        ''', (name,))
+        if row:
+            return {
+                'id': row[0],
+                'name': row[1],
+                'display_name': row[2],
+                'description': row[3],
+                'created_by': row[4],
+                'is_private': row[5],
+                'allow_messages': row[6],
+                'avatar_path': row[7],
+                'subscriber_count': row[8] or 0
+            }
+        return None
+
+    def exists(self, name):
+        return self._one('SELECT id FROM channels WHERE name = ?', (name,)) is not None
+
+    def is_member(self, name, username):
+        return self._one('''
+            SELECT 1 FROM channel_members cm
+            JOIN channels c ON cm.channel_id = c.id
+            WHERE c.name = ? AND cm.username = ?
+        ''', (name, username)) is not None
+
+    def list_for_user(self, username):
+        rows = self._all('''
+            SELECT c.name, c.display_name, c.description, c.is_private, c.allow_messages, c.created_by, c.avatar_path,
+                   c.subscriber_count
+            FROM channels c
+            JOIN channel_members cm ON c.id = cm.channel_id
+            WHERE cm.username = ?
+            ORDER BY c.name
+        ''', (username,))
+        return [_channel(row) for row in rows]
+
+    def search_documents(self):
+        # Поля для индекса поиска (search_index.SearchIndex)
+        return [(row[0], [row[0], row[1] or '', row[2] or ''])
+                for row in self._all('SELECT name, display_name, description FROM channels')]
+
+    def get_many(self, names):
+        # Каналы по списку имен в том же порядке
+        if not names:
+            return []
+        rows = self._all(f'''
+            SELECT c.name, c.display_name, c.description, c.is_private, c.allow_messages, c.created_by, c.avatar_path,
+                   c.subscriber_count
+            FROM channels c
+            WHERE c.name IN ({', '.join('?' for _ in names)})
+        ''', list(names))
+        channels = {row[0]: _channel(row) for row in rows}
+        return [channels[name] for name in names if name in channels]
+
+
+# === Избранное ===
+class FavoriteRepository(Repository):
+    def add(self, username, content=None, file_path=None, file_name=None, file_type='text', category='general'):
+        def write(conn):
+            c = conn.cursor()
+            favorite_id = self.db.insert(c, '''
+                INSERT INTO favorites (username, content, file_path, file_name, file_type, category)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (username, content, file_path, file_name, file_type, category))
+            adjust_media_refs(c, [file_path], 1)
+            return favorite_id
+        return self.db.write(write)
+
+    def list(self, username, category=None):
+        if category:
+            rows = self._all('''
+                SELECT id, content, file_path, file_name, file_type, created_at, is_pinned, category
+                FROM favorites
+                WHERE username = ? AND category = ?
+                ORDER BY is_pinned DESC, created_at DESC
+            ''', (username, category))
+        else:
+            rows = self._all('''
+                SELECT id, content, file_path, file_name, file_type, created_at, is_pinned, category
+                FROM favorites
+                WHERE username = ?
+                ORDER BY is_pinned DESC, created_at DESC
+            ''', (username,))
+        return [{
+            'id': row[0],
+            'content': row[1],
+            'file_path': row[2],
+            'file_name': row[3],
+            'file_type': row[4],
+            'created_at': _timestamp(row[5]),
+            'is_pinned': bool(row[6]),
+            'category': row[7]
+        } for row in rows]
+
+    def delete(self, favorite_id, username):
+        def write(conn):
+            c = conn.cursor()
+            c.execute('SELECT file_path FROM favorites WHERE id = ? AND username = ?', (favorite_id, username))
+            row = c.fetchone()
+            if not row:
+                return False
+            c.execute('DELETE FROM favorites WHERE id = ? AND username = ?', (favorite_id, username))
+            adjust_media_refs(c, [row[0]], -1)
+            return True
+        return self.db.write(write)
+
+    def toggle_pin(self, favorite_id, username):
+        def write(conn):
+            c = conn.cursor()
+            c.execute('SELECT is_pinned FROM favorites WHERE id = ? AND username = ?', (favorite_id, username))
+            row = c.fetchone()
+            if row:
+                new_state = not bool(row[0])
+                c.execute('UPDATE favorites SET is_pinned = ? WHERE id = ? AND username = ?',
+                          (new_state, favorite_id, username))
+                return new_state
+            return None
+        return self.db.write(write)
+
+    def categories(self, username):
+        return [row[0] for row in self._all('SELECT DISTINCT category FROM favorites WHERE username = ? ORDER BY category', (username,))]
+
+
+# === Личные переписки ===
+class ConversationRepository(Repository):
+    def partners(self, username):
+        return [row[0] for row in self._all(
+            'SELECT partner FROM conversations WHERE username = ? ORDER BY last_message_id DESC', (username,))]
+
+    def list(self, username):
+        # Личные переписки с последним сообщением, самые свежие первыми
+        rows = self._all('''
+            SELECT c.partner, r.seq - COALESCE(rc.read_seq, 0), c.last_activity, m.id, m.username, m.message,
+                   m.message_type, m.file_name, m.timestamp
+            FROM conversations c
+            JOIN messages m ON m.id = c.last_message_id
+            LEFT JOIN room_state r ON r.room = c.room
+            LEFT JOIN read_cursors rc ON rc.username = c.username AND rc.room = c.room
+            WHERE c.username = ?
+            ORDER BY c.last_message_id DESC
+        ''', (username,))
+        return [{
+            'username': row[0],
+            'unread': row[1] or 0,
+            'last_activity': _timestamp(row[2]),
+            'last_message': {
+                'id': row[3],
+                'user': row[4],
+                'message': row[5],
+                'type': row[6],
+                'file_name': row[7],
+                'timestamp': _timestamp(row[8])
+            }
+        } for row in rows]
+
+
+# === Прочтение ===
+class ReadStateRepository(Repository):
+    def _visible(self, c, username, room):
+        if room.startswith('private_'):
+            parts = room.split('_')
+            return len(parts) == 3 and username in parts[1:]
+        if room.startswith('channel_'):
+            c.execute('''
+                SELECT 1 FROM channel_members cm JOIN channels ch ON ch.id = cm.channel_id
+                WHERE ch.name = ? AND cm.username = ?
+            ''', (room[len('channel_'):], username))
+            return c.fetchone() is not None
+        return False
+
+    def advance(self, cursors):
+        # cursors: {(username, room): id прочитанного сообщения или None - последнее в комнате}.
+        # Одна транзакция на пачку; возвращает [(username, room, id, непрочитанных), ...]
+        # для курсоров, которые сдвинулись
+        def write(conn):
+            c = conn.cursor()
+            advanced = []
+            for (username, room), message_id in cursors.items():
+                if not self._visible(c, username, room):
+                    continue
+                if message_id is None:
+                    c.execute('SELECT last_message_id, seq FROM room_state WHERE room = ?', (room,))
+                else:
+                    c.execute('SELECT id, seq FROM messages WHERE id = ? AND room = ?', (message_id, room))
+                row = c.fetchone()
+                if not row or row[0] is None or row[1] is None:
+                    continue
+                if advance_cursor(c, username, room, row[0], row[1]):
+                    c.execute('SELECT seq FROM room_state WHERE room = ?', (room,))
+                    advanced.append((username, room, row[0], c.fetchone()[0] - row[1]))
+            return advanced
+        return self.db.write(write)
+
+    def unread(self, username):
+        # {комната: {...}} для каналов и личных переписок пользователя; у личных -
+        # докуда дочитал собеседник (для отметок о прочтении). Курсор собеседника ищется
+        # по первичному ключу (partner, room) через conversations
+        rows = self._all('''
+            SELECT r.room, r.seq - COALESCE(rc.read_seq, 0), r.last_message_id, rc.last_read_message_id,
+                   pc.last_read_message_id
+            FROM (
+                SELECT 'channel_' || ch.name AS room FROM channel_members cm
+                JOIN channels ch ON ch.id = cm.channel_id WHERE cm.username = ?
+                UNION
+                SELECT room FROM conversations WHERE username = ?
+            ) mine
+            JOIN room_state r ON r.room = mine.room
+            LEFT JOIN read_cursors rc ON rc.username = ? AND rc.room = r.room
+            LEFT JOIN conversations cv ON cv.username = ? AND cv.room = r.room AND cv.partner != cv.username
+            LEFT JOIN read_cursors pc ON pc.username = cv.partner AND pc.room = r.room
+        ''', (username, username, username, username))
+        return {row[0]: {
+            'unread': row[1],
+            'last_message_id': row[2],
+            'last_read_message_id': row[3],
+            'partner_read_message_id': row[4]
+        } for row in rows}
+
+
+# === Медиафайлы ===
+class MediaRepository(Repository):
+    def register(self, digest, path, size):
+        # Новая загрузка продлевает жизнь уже известного файла: сборщик мусора
+        # не удалит его, пока не пройдет срок ожидания от последнего касания
+        def write(conn):
+            c = conn.cursor()
+            now = int(time.time())
+            c.execute('UPDATE media SET updated_at = ? WHERE hash = ?', (now, digest))
+            if c.rowcount == 0:
+                c.execute('INSERT OR IGNORE INTO media (hash, path, size, updated_at) VALUES (?, ?, ?, ?)',
+                          (digest, path, size, now))
+        return self.db.write(write)
+
+    def garbage(self, older_than, limit=500):
+        return self._all('SELECT hash, path FROM media WHERE refcount <= 0 AND updated_at < ? LIMIT ?',
+                         (older_than, limit))
+
+    def delete_unreferenced(self, digest, older_than):
+        def write(conn):
+            c = conn.cursor()
+            c.execute('SELECT path FROM media WHERE hash = ? AND refcount <= 0 AND updated_at < ?',
+                      (digest, older_than))
+            row = c.fetchone()
+            if not row:
+                return False
+            c.execute('DELETE FROM media_variants WHERE source = ?', (row[0],))
+            c.execute('DELETE FROM media WHERE hash = ?', (digest,))
+            return True
+        return self.db.write(write)
+
+    def add_variants(self, source, variants):
+        # variants - [(имя, путь, ширина, высота, размер), ...]
+        def write(conn):
+            c = conn.cursor()
+            for name, path, width, height, size in variants:
+                c.execute('''
+                    INSERT OR IGNORE INTO media_variants (source, name, path, width, height, size)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (source, name, path, width, height, size))
+            bump_version(c, 'variants')
+        return self.db.write(write)
+
+    def variants(self, sources):
+        # {URL оригинала: {имя варианта: URL}} одним запросом
+        sources = sorted({source for source in sources if source})
+        if not sources:
+            return {}
+        placeholders = ', '.join('?' * len(sources))
+        found = {}
+        for source, name, path in self._all(
+                f'SELECT source, name, path FROM media_variants WHERE source IN ({placeholders})', sources):
+            found.setdefault(source, {})[name] = path
+        return found
+
+    def stats(self):
+        row = self._one('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount), 0) FROM media')
+        variants = self._one('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_variants')
+        return {'files': row[0], 'bytes': row[1], 'references': row[2],
+                'variants': variants[0], 'variant_bytes': variants[1]}
+
+
+class Storage:
+    # Точка входа для обработчиков: storage.users, storage.messages, storage.channels,
+    # storage.favorites, storage.conversations, storage.read_state, storage.media
+    def __init__(self, db):
+        self.db = db
+        self.users = UserRepository(db)
+        self.messages = MessageRepository(db)
+        self.channels = ChannelRepository(db)
+        self.favorites = FavoriteRepository(db)
+        self.conversations = ConversationRepository(db)
+        self.read_state = ReadStateRepository(db)
+        self.media = MediaRepository(db)
@@ -0,0 +1,27 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Приложение с отдельной БД и папками файлов; папки static/* - из репозитория
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    monkeypatch.setenv('DATABASE_PATH', str(tmp_path / 'messenger.db'))
+    monkeypatch.setenv('MEDIA_FOLDER', str(tmp_path / 'media'))
+    monkeypatch.setenv('UPLOAD_TMP_FOLDER', str(tmp_path / 'uploads_tmp'))
+    monkeypatch.setenv('IMAGE_VARIANT_WORKERS', '0')
+    monkeypatch.delenv('SOCKETIO_MESSAGE_QUEUE', raising=False)
+    web_messenger = importlib.import_module('web_messenger')
+    app = web_messenger.create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/register', data={'username': 'alice', 'password': 'secret1'})
+    client.post('/login', data={'username': 'alice', 'password': 'secret1'})
+    return client
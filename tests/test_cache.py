@@ -0,0 +1,137 @@
+import pytest
+
+import cache
+from cache import LRUCache, ProfileCache, RecentMessages
+
+
+def message(message_id):
+    return {'id': message_id, 'message': f'm{message_id}'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_least_recently_used_is_evicted(clock):
+    lru = LRUCache(maxsize=2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1
+    lru.put('c', 3)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    assert lru.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    lru = LRUCache(ttl=10)
+    lru.put('a', 1)
+    clock[0] += 9.9
+    assert lru.get('a') == 1
+    clock[0] += 0.2
+    assert lru.get('a', 'missing') == 'missing'
+    assert lru.stats()['size'] == 0
+
+
+def test_invalidate_and_hit_ratio(clock):
+    lru = LRUCache()
+    lru.put('a', 1)
+    lru.get('a')
+    lru.invalidate('a')
+    lru.get('a')
+    assert lru.stats()['hits'] == 1
+    assert lru.stats()['hit_ratio'] == 0.5
+
+
+def test_profile_cache_loads_once_and_skips_missing(clock):
+    loads = []
+
+    def loader(username):
+        loads.append(username)
+        return {'username': username} if username == 'alice' else None
+    profiles = ProfileCache(loader)
+    assert profiles.get('alice') == {'username': 'alice'}
+    assert profiles.get('alice') == {'username': 'alice'}
+    assert profiles.get('ghost') is None
+    assert profiles.get('ghost') is None
+    assert loads == ['alice', 'ghost', 'ghost']
+    profiles.invalidate('alice')
+    profiles.get('alice')
+    assert loads[-1] == 'alice'
+
+
+def ids(messages):
+    return None if messages is None else [m['id'] for m in messages]
+
+
+def history(*message_ids):
+    return lambda room, limit: [message(i) for i in message_ids][-limit:]
+
+
+def test_serves_page_from_loaded_room():
+    recent = RecentMessages(history(1, 2, 3), capacity=5)
+    assert ids(recent.page('r', 2)) == [2, 3]
+    assert ids(recent.page('r', 10)) == [1, 2, 3]
+    assert ids(recent.page('r', 10, before_id=3)) == [1, 2]
+    assert recent.stats()['misses'] == 1
+    assert recent.stats()['hits'] == 2
+
+
+def test_out_of_order_insert_without_duplicates():
+    recent = RecentMessages(history(1, 3), capacity=10)
+    recent.page('r', 1)
+    recent.append('r', message(5))
+    recent.append('r', message(2))
+    recent.append('r', message(4))
+    recent.append('r', message(4))
+    assert ids(recent.page('r', 10)) == [1, 2, 3, 4, 5]
+
+
+def test_overflow_evicts_oldest_and_marks_incomplete():
+    recent = RecentMessages(history(1, 2), capacity=3)
+    recent.page('r', 1)
+    recent.append('r', message(3))
+    recent.append('r', message(4))
+    assert ids(recent.page('r', 3)) == [2, 3, 4]
+    # Старше буфера история есть в БД - окно не покрыто
+    assert recent.page('r', 4) is None
+    assert recent.page('r', 2, before_id=3) is None
+
+
+def test_late_message_older_than_full_buffer_is_dropped():
+    recent = RecentMessages(history(), capacity=2)
+    recent.page('r', 1)
+    for i in (5, 6, 7):
+        recent.append('r', message(i))
+    recent.append('r', message(1))
+    assert ids(recent.page('r', 2)) == [6, 7]
+
+
+def test_messages_arriving_during_load_are_merged():
+    recent = RecentMessages(None, capacity=10)
+
+    def loader(room, limit):
+        recent.append(room, message(3))
+        return [message(1), message(2)]
+    recent.loader = loader
+    assert ids(recent.page('r', 10)) == [1, 2, 3]
+
+
+def test_cold_rooms_are_evicted():
+    loads = []
+
+    def loader(room, limit):
+        loads.append(room)
+        return [message(1)]
+    recent = RecentMessages(loader, capacity=5, max_rooms=2)
+    for room in ('a', 'b', 'a', 'c', 'b'):
+        recent.page(room, 1)
+    assert loads == ['a', 'b', 'c', 'b']
+    assert recent.stats()['rooms'] == 2
+
+def test_disabled_buffer_returns_none():
+    recent = RecentMessages(history(1), capacity=0)
+    assert recent.page('r', 1) is None
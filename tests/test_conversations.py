@@ -0,0 +1,41 @@
+import pytest
+
+from storage import Storage
+
+
+@pytest.fixture
+def storage(app):
+    return Storage(app.extensions['db'])
+
+
+def dm(sender, recipient, text='hi'):
+    room = 'private_' + '_'.join(sorted((sender, recipient)))
+    return {'username': sender, 'message': text, 'room': room, 'recipient': recipient}
+
+
+def test_both_participants_get_a_row(storage):
+    [message_id] = storage.messages.save_many([dm('alice', 'bob')])
+    assert storage.conversations.partners('alice') == ['bob']
+    assert storage.conversations.partners('bob') == ['alice']
+    [chat] = storage.conversations.list('bob')
+    assert chat['username'] == 'alice'
+    assert chat['last_message']['id'] == message_id
+    assert chat['unread'] == 1
+    assert storage.conversations.list('alice')[0]['unread'] == 0
+
+
+def test_batch_is_folded_per_participant(storage):
+    ids = storage.messages.save_many([dm('alice', 'bob', 'one'), dm('bob', 'alice', 'two'),
+                                      dm('alice', 'bob', 'three'), dm('carol', 'bob')])
+    chats = {chat['username']: chat for chat in storage.conversations.list('bob')}
+    assert chats['alice']['last_message']['id'] == ids[2]
+    # Свое сообщение сдвигает курсор отправителя: bob прочитал все до 'two'
+    assert chats['alice']['unread'] == 1
+    assert storage.conversations.list('alice')[0]['unread'] == 0
+    # Самая свежая переписка первой
+    assert storage.conversations.partners('bob') == ['carol', 'alice']
+
+
+def test_channel_messages_are_ignored(storage):
+    storage.messages.save_many([{'username': 'alice', 'message': 'hi', 'room': 'channel_general'}])
+    assert storage.conversations.partners('alice') == []
@@ -0,0 +1,35 @@
+import pytest
+
+from db import translate_sql
+
+
+def test_insert_or_ignore_becomes_on_conflict():
+    assert translate_sql('INSERT OR IGNORE INTO media (hash) VALUES (?)') == \
+        'INSERT INTO media (hash) VALUES (%s) ON CONFLICT DO NOTHING'
+
+
+def test_insert_or_ignore_with_select_and_trailing_semicolon():
+    sql = translate_sql('''
+        insert or ignore into channel_members (channel_id, username)
+        SELECT id, ? FROM channels WHERE name = 'general';
+    ''')
+    assert sql.startswith('\n        INSERT INTO channel_members')
+    assert sql.endswith("WHERE name = 'general' ON CONFLICT DO NOTHING")
+    assert '%s' in sql and '?' not in sql
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ('SELECT * FROM users WHERE username = ? AND theme = ?',
+     'SELECT * FROM users WHERE username = %s AND theme = %s'),
+    ("SELECT 1 FROM messages WHERE room LIKE 'private_%'",
+     "SELECT 1 FROM messages WHERE room ILIKE 'private_%%'"),
+    ('CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT)', 'CREATE TABLE t (id BIGSERIAL PRIMARY KEY)'),
+    ('SELECT likes FROM t', 'SELECT likes FROM t'),
+])
+def test_rewrites(sql, expected):
+    assert translate_sql(sql) == expected
+
+
+def test_upsert_is_left_alone():
+    sql = 'INSERT INTO t (a) VALUES (?) ON CONFLICT (a) DO UPDATE SET a = excluded.a'
+    assert translate_sql(sql) == sql.replace('?', '%s')
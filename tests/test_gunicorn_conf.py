@@ -0,0 +1,12 @@
+import os
+import runpy
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+def test_workers_need_message_queue(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    monkeypatch.delenv('SOCKETIO_MESSAGE_QUEUE', raising=False)
+    assert runpy.run_path(CONF)['workers'] == 1
+    monkeypatch.setenv('SOCKETIO_MESSAGE_QUEUE', 'sqlite:///socketio.db')
+    assert runpy.run_path(CONF)['workers'] == 4
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+from storage import Storage
+
+
+@pytest.fixture
+def room(app, client):
+    # 120 сообщений в комнате и шум в соседней; id идут вперемешку между комнатами
+    conn = sqlite3.connect(app.config['DATABASE'])
+    with conn:
+        for i in range(120):
+            conn.execute("INSERT INTO messages (username, message, room) VALUES ('alice', ?, 'channel_general')",
+                         (f'm{i}',))
+            conn.execute("INSERT INTO messages (username, message, room) VALUES ('alice', 'other', 'channel_other')")
+    ids = [row[0] for row in conn.execute("SELECT id FROM messages WHERE room = 'channel_general' ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def page(client, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return client.get(f'/get_messages/channel_general?{query}').get_json()
+
+
+def test_latest_page_in_ascending_order(client, room):
+    messages = page(client)
+    assert [m['id'] for m in messages] == room[-50:]
+    assert messages[-1]['message'] == 'm119'
+
+
+def test_before_id_walks_back_to_the_start(client, room):
+    seen = []
+    cursor = None
+    while True:
+        messages = page(client, limit=40, **({'before_id': cursor} if cursor else {}))
+        if not messages:
+            break
+        seen = [m['id'] for m in messages] + seen
+        cursor = messages[0]['id']
+    assert seen == room
+
+
+def test_after_id_returns_newer_messages(client, room):
+    assert [m['id'] for m in page(client, after_id=room[100])] == room[101:]
+    assert page(client, after_id=room[-1]) == []
+
+
+def test_limit_is_clamped(client, room):
+    assert len(page(client, limit=500)) == 100
+    assert len(page(client, limit=0)) == 1
+
+
+def test_requires_login(app, room):
+    assert app.test_client().get('/get_messages/channel_general').get_json() == {'error': 'auth'}
+
+
+def test_unchanged_room_answers_304(app, client):
+    storage = Storage(app.extensions['db'])
+    storage.messages.save_many([{'username': 'alice', 'message': 'one', 'room': 'channel_general'}])
+    first = client.get('/get_messages/channel_general')
+    etag = first.headers['ETag']
+    assert client.get('/get_messages/channel_general', headers={'If-None-Match': etag}).status_code == 304
+    # Новое сообщение, смена аватара и готовые превью меняют версию комнаты
+    storage.messages.save_many([{'username': 'alice', 'message': 'two', 'room': 'channel_general'}])
+    second = client.get('/get_messages/channel_general', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.get_json()[-1]['message'] == 'two'
+    etag = second.headers['ETag']
+    storage.users.set_avatar('alice', '/static/media/a.png')
+    third = client.get('/get_messages/channel_general', headers={'If-None-Match': etag})
+    assert third.status_code == 200
+    storage.media.add_variants('/static/media/a.png', [])
+    assert client.get('/get_messages/channel_general',
+                      headers={'If-None-Match': third.headers['ETag']}).status_code == 200
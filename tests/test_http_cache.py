@@ -0,0 +1,111 @@
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+
+from http_cache import conditional, init_http_cache
+
+
+@pytest.fixture
+def web():
+    app = Flask(__name__)
+    init_http_cache(app, min_size=100)
+    calls = []
+
+    @app.route('/big')
+    def big():
+        calls.append('big')
+        return jsonify({'items': ['x' * 20] * 50})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/post', methods=['POST'])
+    def post():
+        return jsonify({'items': ['x' * 20] * 50})
+
+    @app.route('/validated/<name>')
+    @conditional(lambda name: app.state.get(name))
+    def validated(name):
+        calls.append(name)
+        return jsonify({'items': [name * 20] * 50})
+
+    app.calls = calls
+    app.state = {'room': 1}
+    return app
+
+
+def test_etag_and_304(web):
+    client = web.test_client()
+    first = client.get('/big')
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    assert 'no-cache' in first.headers['Cache-Control']
+    second = client.get('/big', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert second.data == b''
+
+
+def test_gzip_when_accepted(web):
+    client = web.test_client()
+    plain = client.get('/big')
+    packed = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in packed.headers['Vary']
+    assert gzip.decompress(packed.data) == plain.data
+    assert len(packed.data) < len(plain.data)
+
+
+def test_compressed_variant_has_own_etag(web):
+    client = web.test_client()
+    plain = client.get('/big')
+    packed = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['ETag'] != plain.headers['ETag']
+    assert packed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    # Любое представление той же версии - повод для 304
+    for etag, encoding in ((packed.headers['ETag'], 'gzip'), (packed.headers['ETag'], 'identity'),
+                           (plain.headers['ETag'], 'gzip')):
+        response = client.get('/big', headers={'If-None-Match': etag, 'Accept-Encoding': encoding})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+
+def test_validator_answers_304_without_running_view(web):
+    client = web.test_client()
+    first = client.get('/validated/room', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['ETag'].endswith('-gzip"')
+    again = client.get('/validated/room', headers={'If-None-Match': first.headers['ETag'], 'Accept-Encoding': 'gzip'})
+    assert again.status_code == 304
+    assert 'Accept-Encoding' in again.headers['Vary']
+    assert web.calls == ['room']
+    web.state['room'] = 2
+    changed = client.get('/validated/room', headers={'If-None-Match': first.headers['ETag'], 'Accept-Encoding': 'gzip'})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert web.calls == ['room', 'room']
+
+
+def test_without_state_falls_back_to_body_hash(web):
+    client = web.test_client()
+    first = client.get('/validated/other')
+    assert client.get('/validated/other', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert web.calls == ['other', 'other']
+
+
+def test_compressed_body_is_reused(web):
+    client = web.test_client()
+    client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    stats = web.extensions['http_cache'].stats()
+    assert (stats['misses'], stats['hits']) == (1, 1)
+
+
+def test_small_and_non_get_are_left_alone(web):
+    client = web.test_client()
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    assert 'ETag' in small.headers
+    post = client.post('/post', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in post.headers
+    assert 'ETag' not in post.headers
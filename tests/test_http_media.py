@@ -0,0 +1,112 @@
+import io
+import os
+
+import pytest
+from flask import Flask
+
+from http_media import MediaServer
+
+BODY = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / 'media' / 'ab').mkdir(parents=True)
+    (tmp_path / 'media' / 'ab' / 'abcdef.bin').write_bytes(BODY)
+    (tmp_path / 'uploads').mkdir()
+    (tmp_path / 'uploads' / 'old.bin').write_bytes(BODY)
+    return tmp_path
+
+
+def make_client(root, offload=None):
+    app = Flask(__name__, static_folder=None)
+    server = MediaServer(str(root / 'media'), True, offload, '/_static/media/')
+    legacy = MediaServer(str(root), False, offload)
+
+    @app.route('/static/media/<path:filename>')
+    def media_files(filename):
+        return server.send(filename)
+
+    @app.route('/static/<path:filename>')
+    def static_files(filename):
+        return legacy.send(filename)
+
+    return app.test_client(), server
+
+
+def test_full_response_is_cacheable(root):
+    client, server = make_client(root)
+    response = client.get('/static/media/ab/abcdef.bin')
+    assert response.status_code == 200
+    assert response.data == BODY
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.headers['ETag'] == '"abcdef.bin"'
+    assert 'no-cache' in client.get('/static/uploads/old.bin').headers['Cache-Control']
+    assert server.stats()['full'] == 1
+
+
+def test_range_is_206(root):
+    client, server = make_client(root)
+    response = client.get('/static/media/ab/abcdef.bin', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(BODY)}'
+    assert response.data == BODY[100:200]
+    assert server.stats()['partial'] == 1
+
+
+def test_range_past_end_is_416(root):
+    client, _ = make_client(root)
+    response = client.get('/static/media/ab/abcdef.bin', headers={'Range': f'bytes={len(BODY)}-'})
+    assert response.status_code == 416
+
+
+def test_etag_revalidation_is_304(root):
+    client, server = make_client(root)
+    etag = client.get('/static/media/ab/abcdef.bin').headers['ETag']
+    response = client.get('/static/media/ab/abcdef.bin', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert server.stats()['not_modified'] == 1
+    etag = client.get('/static/uploads/old.bin').headers['ETag']
+    assert client.get('/static/uploads/old.bin', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_missing_and_escaping_paths_are_404(root):
+    client, _ = make_client(root)
+    assert client.get('/static/media/ab/missing.bin').status_code == 404
+    assert client.get('/static/../etc/passwd').status_code == 404
+
+
+@pytest.mark.parametrize('offload, header, value', [
+    ('x-accel', 'X-Accel-Redirect', '/_static/media/ab/abcdef.bin'),
+    ('x-sendfile', 'X-Sendfile', None),
+])
+def test_offload_leaves_body_to_proxy(root, offload, header, value):
+    client, server = make_client(root, offload)
+    response = client.get('/static/media/ab/abcdef.bin')
+    assert response.data == b''
+    assert response.headers[header] == (value or str(root / 'media' / 'ab' / 'abcdef.bin'))
+    assert server.stats()['offloaded'] == 1
+
+
+def test_media_folder_outside_static_is_served(app, client):
+    # conftest кладет MEDIA_FOLDER во временный каталог, вне static
+    path = client.post('/upload_file', data={'file': (io.BytesIO(BODY), 'clip.txt')}).get_json()['path']
+    assert not os.path.abspath(app.config['MEDIA_FOLDER']).startswith(os.path.abspath('static'))
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.data == BODY
+    assert 'immutable' in response.headers['Cache-Control']
+    response = client.get(path, headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(BODY)}'
+    assert response.data == BODY[10:20]
+    assert client.get(path, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_media_service_folders_are_hidden(app, client):
+    tmp = os.path.join(app.config['MEDIA_FOLDER'], 'tmp', 'partial')
+    with open(tmp, 'wb') as f:
+        f.write(b'x')
+    assert client.get(app.config['MEDIA_URL'] + '/tmp/partial').status_code != 200
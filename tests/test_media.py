@@ -0,0 +1,96 @@
+import io
+import os
+import time
+
+import pytest
+
+from media import MediaStore
+from storage import Storage
+
+
+@pytest.fixture
+def storage(app):
+    return Storage(app.extensions['db'])
+
+
+@pytest.fixture
+def media(storage, tmp_path):
+    return MediaStore(str(tmp_path / 'store'), '/static/media', storage.media)
+
+
+@pytest.fixture
+def later(monkeypatch):
+    # Часы после срока ожидания сборщика
+    def advance(seconds):
+        now = time.time() + seconds
+        monkeypatch.setattr(time, 'time', lambda: now)
+    return advance
+
+
+def test_same_content_is_stored_once(media, storage):
+    first = media.save_stream(io.BytesIO(b'cat'), 'png')
+    second = media.save_stream(io.BytesIO(b'cat'), 'png')
+    assert first == second
+    assert first.startswith('/static/media/')
+    with open(media.path_for(first), 'rb') as f:
+        assert f.read() == b'cat'
+    stats = storage.media.stats()
+    assert (stats['files'], stats['bytes'], stats['references']) == (1, 3, 0)
+
+
+def test_path_for_rejects_foreign_urls(media):
+    assert media.path_for('/static/uploads/a.png') is None
+    assert media.path_for('/static/media/../../etc/passwd') is None
+
+
+def test_rows_hold_references(media, storage):
+    url = media.save_stream(io.BytesIO(b'doc'), 'txt')
+    storage.messages.save_many([{'username': 'alice', 'message': '', 'room': 'channel_general', 'file_path': url}])
+    favorite_id = storage.favorites.add('alice', file_path=url, file_type='file')
+    assert storage.media.stats()['references'] == 2
+    storage.favorites.delete(favorite_id, 'alice')
+    assert storage.media.stats()['references'] == 1
+
+
+def test_gc_removes_only_unreferenced_after_grace(media, storage, later):
+    kept = media.save_stream(io.BytesIO(b'kept'), 'txt')
+    dropped = media.save_stream(io.BytesIO(b'dropped'), 'txt')
+    storage.messages.save_many([{'username': 'alice', 'message': '', 'room': 'channel_general', 'file_path': kept}])
+    assert media.gc(grace=60) == 0
+    later(120)
+    assert media.gc(grace=60) == 1
+    assert os.path.exists(media.path_for(kept))
+    assert not os.path.exists(media.path_for(dropped))
+    assert storage.media.stats()['files'] == 1
+
+
+def test_gc_restores_file_uploaded_again(media, storage, later, monkeypatch):
+    url = media.save_stream(io.BytesIO(b'again'), 'txt')
+    later(120)
+    delete_unreferenced = storage.media.delete_unreferenced
+
+    def reupload_first(digest, older_than):
+        # Та же загрузка пришла, пока файл лежал в корзине
+        storage.media.register(digest, url, 5)
+        return delete_unreferenced(digest, older_than)
+
+    monkeypatch.setattr(storage.media, 'delete_unreferenced', reupload_first)
+    assert media.gc(grace=60) == 0
+    with open(media.path_for(url), 'rb') as f:
+        assert f.read() == b'again'
+    assert storage.media.stats()['files'] == 1
+
+
+def test_url_prefix_does_not_follow_folder(storage, tmp_path):
+    media = MediaStore(str(tmp_path / 'elsewhere'), '/files/', storage.media)
+    url = media.save_stream(io.BytesIO(b'moved'), 'txt')
+    assert url.startswith('/files/')
+    assert media.path_for(url).startswith(str(tmp_path / 'elsewhere'))
+
+
+def test_uploads_land_in_media_folder(app, client):
+    path = client.post('/upload_file', data={'file': (io.BytesIO(b'hello'), 'notes.txt')}).get_json()['path']
+    assert path.startswith(app.config['MEDIA_URL'] + '/')
+    stored = os.path.join(app.config['MEDIA_FOLDER'], *path[len(app.config['MEDIA_URL']) + 1:].split('/'))
+    with open(stored, 'rb') as f:
+        assert f.read() == b'hello'
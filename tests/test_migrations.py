@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from migrations import MIGRATIONS, current_version, migrate
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'messenger.db'))
+    yield conn
+    conn.close()
+
+
+def tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def indexes(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database_gets_every_migration(conn):
+    assert migrate(conn) == [number for number, _, _ in MIGRATIONS]
+    assert current_version(conn) == MIGRATIONS[-1][0]
+    assert {'users', 'messages', 'channels', 'channel_members', 'favorites'} <= tables(conn)
+    assert 'idx_messages_room_id' in indexes(conn)
+    assert conn.execute("SELECT created_by FROM channels WHERE name = 'general'").fetchone() == ('system',)
+
+
+def test_second_run_applies_nothing(conn):
+    migrate(conn)
+    assert migrate(conn) == []
+    assert conn.execute('SELECT COUNT(*) FROM channels').fetchone() == (1,)
+
+
+def test_database_from_before_migrations_keeps_its_data(conn):
+    # Схема, созданная прежним init_db(): таблицы есть, schema_version нет
+    conn.execute('''
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_online BOOLEAN DEFAULT FALSE,
+            avatar_color TEXT DEFAULT '#6366F1',
+            avatar_path TEXT,
+            theme TEXT DEFAULT 'dark',
+            profile_description TEXT DEFAULT ''
+        )
+    ''')
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('alice', 'hash')")
+    assert migrate(conn)[0] == 1
+    assert conn.execute('SELECT username FROM users').fetchall() == [('alice',)]
+
+
+def test_read_cursors_replace_conversation_unread(conn, monkeypatch):
+    # База на версии 6: у bob три непрочитанных из пяти сообщений переписки
+    monkeypatch.setattr('migrations.MIGRATIONS', [m for m in MIGRATIONS if m[0] <= 5])
+    migrate(conn)
+    for i in range(5):
+        sender, recipient = ('alice', 'bob') if i % 2 == 0 else ('bob', 'alice')
+        conn.execute("INSERT INTO messages (username, message, room, recipient) VALUES (?, ?, 'private_alice_bob', ?)",
+                     (sender, f'm{i}', recipient))
+    conn.execute("INSERT INTO messages (username, message, room) VALUES ('alice', 'hello', 'channel_general')")
+    conn.execute("INSERT INTO channel_members (channel_id, username) SELECT id, 'bob' FROM channels WHERE name = 'general'")
+    monkeypatch.setattr('migrations.MIGRATIONS', [m for m in MIGRATIONS if m[0] <= 6])
+    migrate(conn)
+    conn.execute("UPDATE conversations SET unread = CASE username WHEN 'bob' THEN 3 ELSE 0 END")
+    monkeypatch.undo()
+    assert 7 in migrate(conn)
+    assert 'unread' not in {row[1] for row in conn.execute('PRAGMA table_info(conversations)')}
+    assert conn.execute("SELECT seq FROM room_state WHERE room = 'private_alice_bob'").fetchone() == (5,)
+    assert conn.execute('SELECT seq FROM messages WHERE room = ? ORDER BY id', ('private_alice_bob',)).fetchall() == \
+        [(1,), (2,), (3,), (4,), (5,)]
+    cursors = dict(((u, r), s) for u, r, s in conn.execute('SELECT username, room, read_seq FROM read_cursors'))
+    assert cursors[('bob', 'private_alice_bob')] == 2
+    assert cursors[('alice', 'private_alice_bob')] == 5
+    # Участники каналов считаются прочитавшими историю
+    assert cursors[('bob', 'channel_general')] == 1
@@ -0,0 +1,88 @@
+import pytest
+
+from presence import PresenceTracker
+from storage import Storage
+
+
+@pytest.fixture
+def users(app, client):
+    return Storage(app.extensions['db']).users
+
+
+def test_tabs_are_counted_per_user():
+    presence = PresenceTracker(lambda worker, statuses: None, lambda worker, expire_before: [])
+    assert presence.connect('alice', 'tab1')
+    assert not presence.connect('alice', 'tab2')
+    assert not presence.disconnect('alice', 'tab1')
+    assert presence.status('alice')
+    assert presence.disconnect('alice', 'tab2')
+    assert not presence.status('alice')
+    assert presence.status('alice', stored=True)
+
+
+def test_changes_are_flushed_in_one_batch(users):
+    presence = PresenceTracker(users.set_online_many, users.touch_online)
+    presence.connect('alice', 'tab1')
+    presence.disconnect('alice', 'tab1')
+    presence.connect('alice', 'tab2')
+    assert presence.flush() == 1
+    assert users.get('alice')['is_online']
+    assert presence.flush() == 0
+    presence.disconnect('alice', 'tab2')
+    presence.flush()
+    assert not users.get('alice')['is_online']
+    assert presence.stats()['flushes'] == 2
+
+
+def test_failed_flush_is_retried():
+    batches = []
+
+    def flush(worker, statuses):
+        if not batches:
+            batches.append(None)
+            raise RuntimeError('db is down')
+        batches.append(statuses)
+
+    presence = PresenceTracker(flush, lambda worker, expire_before: [])
+    presence.connect('alice', 'tab1')
+    assert presence.flush() == 0
+    assert presence.flush() == 1
+    assert batches[-1] == {'alice': True}
+
+
+def test_reconnect_within_window_is_not_announced():
+    presence = PresenceTracker(lambda worker, statuses: None, lambda worker, expire_before: [])
+    presence.connect('alice', 'tab1')
+    assert presence.take_changes() == {'alice': True}
+    presence.disconnect('alice', 'tab1')
+    presence.connect('alice', 'tab2')
+    assert presence.take_changes() == {}
+
+
+def test_user_stays_online_while_another_worker_has_a_tab(users):
+    worker_a = PresenceTracker(users.set_online_many, users.touch_online)
+    worker_b = PresenceTracker(users.set_online_many, users.touch_online)
+    worker_a.connect('alice', 'tab1')
+    worker_b.connect('alice', 'tab2')
+    worker_a.flush()
+    worker_b.flush()
+    worker_a.disconnect('alice', 'tab1')
+    worker_a.flush()
+    assert users.get('alice')['is_online']
+    assert users.online_elsewhere(worker_a.worker_id(), ['alice']) == {'alice'}
+    worker_b.disconnect('alice', 'tab2')
+    worker_b.flush()
+    assert not users.get('alice')['is_online']
+    assert users.online_elsewhere(worker_a.worker_id(), ['alice']) == set()
+
+
+def test_rows_of_silent_worker_expire(users, monkeypatch):
+    crashed = PresenceTracker(users.set_online_many, users.touch_online)
+    alive = PresenceTracker(users.set_online_many, users.touch_online, ttl=60)
+    crashed.connect('alice', 'tab1')
+    crashed.flush()
+    assert alive.touch() == []
+    assert users.get('alice')['is_online']
+    monkeypatch.setattr('presence.time.time', lambda: 10 ** 10)
+    assert alive.touch() == ['alice']
+    assert not users.get('alice')['is_online']
@@ -0,0 +1,87 @@
+import pytest
+
+import ratelimit
+from cache import LRUCache
+from ratelimit import TokenBucketLimiter
+from storage import Storage
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_burst_then_limited(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    assert [limiter.hit('alice')[0] for _ in range(4)] == [True, True, True, False]
+    assert limiter.stats()['allowed'] == 3
+    assert limiter.stats()['limited'] == 1
+
+
+def test_wait_until_next_token(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=1)
+    limiter.hit('alice')
+    allowed, wait = limiter.hit('alice')
+    assert not allowed
+    assert wait == pytest.approx(0.5)
+
+
+def test_refill_is_capped_by_burst(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=2)
+    limiter.hit('alice')
+    limiter.hit('alice')
+    clock[0] += 0.5
+    assert limiter.hit('alice') == (True, 0)
+    assert not limiter.hit('alice')[0]
+    clock[0] += 60
+    assert [limiter.hit('alice')[0] for _ in range(3)] == [True, True, False]
+
+
+def test_keys_are_independent_and_evicted(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    assert limiter.hit('alice')[0]
+    assert limiter.hit('bob')[0]
+    assert limiter.hit('carol')[0]
+    assert limiter.stats()['keys'] == 2
+    # Корзина alice вытеснена - начинается заново полной
+    assert limiter.hit('alice')[0]
+
+
+def test_search_returns_429_with_retry_after(app, client):
+    statuses = [client.get('/search_users_channels?q=al') for _ in range(app.config['SEARCH_BURST'] + 1)]
+    assert [r.status_code for r in statuses[:-1]] == [200] * app.config['SEARCH_BURST']
+    assert statuses[-1].status_code == 429
+    assert 1 <= int(statuses[-1].headers['Retry-After'])
+
+
+def test_search_limit_is_per_user_not_per_cookie(app, client):
+    # Повтор одной и той же cookie не дает новой корзины
+    cookie = client.get_cookie('session').value
+    codes = []
+    for _ in range(app.config['SEARCH_BURST'] + 1):
+        other = app.test_client()
+        other.set_cookie('session', cookie)
+        codes.append(other.get('/search_users_channels?q=al').status_code)
+    assert codes[-1] == 429
+
+
+def test_search_cache_is_shared_between_users(app, client, monkeypatch):
+    # Запись кэша общая: без исключения автора запроса и без онлайн-статусов воркера
+    stored = []
+    put = LRUCache.put
+    monkeypatch.setattr(LRUCache, 'put', lambda self, key, value: (stored.append((key, value)), put(self, key, value)))
+    other = app.test_client()
+    other.post('/register', data={'username': 'alina', 'password': 'secret1'})
+    other.post('/login', data={'username': 'alina', 'password': 'secret1'})
+    stored.clear()
+    mine = client.get('/search_users_channels?q=al').get_json()['results']
+    theirs = other.get('/search_users_channels?q=al').get_json()['results']
+    assert [u['username'] for u in mine['users']] == ['alina']
+    assert [u['username'] for u in theirs['users']] == ['alice']
+    [(key, entry)] = [(key, value) for key, value in stored if isinstance(value, dict) and 'users' in value]
+    assert key == ('al', 20)
+    assert sorted(u['username'] for u in entry['users']) == ['alice', 'alina']
+    users = Storage(app.extensions['db']).users
+    assert all(u['online'] == users.get(u['username'])['is_online'] for u in entry['users'])
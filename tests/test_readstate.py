@@ -0,0 +1,99 @@
+import pytest
+
+from readstate import ReadCursorBuffer
+from storage import Storage
+
+
+@pytest.fixture
+def storage(app):
+    return Storage(app.extensions['db'])
+
+
+@pytest.fixture
+def dm(storage):
+    # Три сообщения alice для bob
+    return storage.messages.save_many([
+        {'username': 'alice', 'message': f'm{i}', 'room': 'private_alice_bob', 'recipient': 'bob'} for i in range(3)
+    ])
+
+
+def test_keeps_furthest_cursor_per_room():
+    batches = []
+    buffer = ReadCursorBuffer(lambda cursors: batches.append(cursors) or [])
+    buffer.update('alice', 'channel_general', 5)
+    buffer.update('alice', 'channel_general', 3)
+    buffer.update('alice', 'channel_general', 7)
+    buffer.update('bob', 'channel_general', 2)
+    buffer.flush()
+    assert batches == [{('alice', 'channel_general'): 7, ('bob', 'channel_general'): 2}]
+    assert buffer.stats()['received'] == 4
+
+
+def test_none_means_latest_and_wins():
+    batches = []
+    buffer = ReadCursorBuffer(lambda cursors: batches.append(cursors) or [])
+    buffer.update('alice', 'private_alice_bob', 4)
+    buffer.update('alice', 'private_alice_bob')
+    buffer.update('alice', 'private_alice_bob', 9)
+    buffer.flush()
+    assert batches == [{('alice', 'private_alice_bob'): None}]
+
+
+def test_flush_returns_advanced_and_empties_buffer():
+    buffer = ReadCursorBuffer(lambda cursors: [(u, r, i, 0) for (u, r), i in cursors.items()])
+    assert buffer.flush() == []
+    buffer.update('alice', 'channel_general', 1)
+    assert buffer.flush() == [('alice', 'channel_general', 1, 0)]
+    assert buffer.flush() == []
+    assert buffer.stats()['flushes'] == 1
+    assert buffer.stats()['advanced'] == 1
+
+
+def test_failed_flush_requeues_without_overwriting_newer():
+    calls = []
+
+    def flush(cursors):
+        calls.append(dict(cursors))
+        if len(calls) == 1:
+            buffer.update('alice', 'channel_general', 8)
+            raise RuntimeError('database is locked')
+        return []
+    buffer = ReadCursorBuffer(flush)
+    buffer.update('alice', 'channel_general', 5)
+    buffer.update('bob', 'channel_general', 6)
+    assert buffer.flush() == []
+    assert buffer.stats()['pending'] == 2
+    buffer.flush()
+    assert calls[1] == {('alice', 'channel_general'): 8, ('bob', 'channel_general'): 6}
+
+
+@pytest.mark.parametrize('max_batch', [1, 2])
+def test_batch_size_is_bounded(max_batch):
+    sizes = []
+    buffer = ReadCursorBuffer(lambda cursors: sizes.append(len(cursors)) or [], max_batch=max_batch)
+    for room in ('a', 'b', 'c'):
+        buffer.update('alice', room, 1)
+    while buffer.stats()['pending']:
+        buffer.flush()
+    assert max(sizes) == max_batch
+    assert sum(sizes) == 3
+
+
+def test_cursor_moves_forward_only(storage, dm):
+    assert storage.read_state.advance({('bob', 'private_alice_bob'): dm[1]}) == [('bob', 'private_alice_bob', dm[1], 1)]
+    assert storage.read_state.advance({('bob', 'private_alice_bob'): dm[0]}) == []
+    assert storage.read_state.unread('bob')['private_alice_bob']['unread'] == 1
+    assert storage.read_state.advance({('bob', 'private_alice_bob'): None}) == [('bob', 'private_alice_bob', dm[2], 0)]
+
+
+def test_partner_sees_read_receipt(storage, dm):
+    storage.read_state.advance({('bob', 'private_alice_bob'): dm[0]})
+    state = storage.read_state.unread('alice')['private_alice_bob']
+    assert state == {'unread': 0, 'last_message_id': dm[2], 'last_read_message_id': dm[2],
+                     'partner_read_message_id': dm[0]}
+
+
+def test_foreign_rooms_are_ignored(storage, dm):
+    assert storage.read_state.advance({('carol', 'private_alice_bob'): None,
+                                       ('carol', 'channel_general'): None}) == []
+    assert storage.read_state.unread('carol') == {}
@@ -0,0 +1,76 @@
+from search_index import SearchIndex, normalize
+
+
+def make_index(docs, **kwargs):
+    index = SearchIndex(lambda: list(docs.items()), **kwargs)
+    index.rebuild()
+    return index
+
+
+def test_exact_then_prefix_then_substring():
+    index = make_index({
+        'joanna': ['joanna'],
+        'annabel': ['annabel'],
+        'anna': ['anna'],
+        'ann': ['ann'],
+        'bob': ['bob'],
+    })
+    assert index.search('ann') == ['ann', 'anna', 'annabel', 'joanna']
+
+
+def test_earlier_field_ranks_higher():
+    index = make_index({
+        'by_description': ['zzz', 'Zzz', 'news about python'],
+        'by_name': ['python', 'Python', ''],
+    })
+    assert index.search('python') == ['by_name', 'by_description']
+
+
+def test_query_is_normalized():
+    index = make_index({'alice': ['Alice Smith']})
+    assert normalize('  ALICE   smith ') == 'alice smith'
+    assert index.search('ALICE  Smith') == ['alice']
+
+
+def test_exclude_and_limit():
+    index = make_index({name: [name] for name in ('al', 'alb', 'alc', 'ald')})
+    assert index.search('al', limit=2) == ['al', 'alb']
+    assert index.search('al', exclude='al') == ['alb', 'alc', 'ald']
+
+
+def test_substring_needs_two_characters():
+    index = make_index({'xay': ['xay']})
+    assert index.search('a') == []
+    assert index.search('ay') == ['xay']
+
+
+def test_add_replaces_fields():
+    index = make_index({'general': ['general', 'Общий']})
+    index.add('general', ['general', 'Новости'])
+    index.add('random', ['random', 'Флуд'])
+    assert index.search('общий') == []
+    assert index.search('новости') == ['general']
+    assert index.search('флуд') == ['random']
+    assert index.stats()['documents'] == 2
+
+
+def test_rebuilds_when_stale():
+    docs = {'alice': ['alice']}
+    index = make_index(docs, max_age=0)
+    docs['alina'] = ['alina']
+    assert index.search('ali') == ['alice', 'alina']
+
+
+def test_substring_scan_is_capped():
+    # Все кандидаты содержат обе n-граммы запроса, но не сам запрос
+    index = make_index({f'abc-bcd-{i}': [f'abc-bcd-{i}'] for i in range(50)}, scan_limit=10)
+    checked = []
+
+    class Docs(dict):
+        def __getitem__(self, key):
+            checked.append(key)
+            return dict.__getitem__(self, key)
+
+    index._docs = Docs(index._docs)
+    assert index.search('abcd') == []
+    assert len(checked) == 10
@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def rooms(app, client):
+    # alice состоит в канале team, но не в secret; личные переписки - alice/bob и bob/carol
+    conn = sqlite3.connect(app.config['DATABASE'])
+    with conn:
+        for name in ('team', 'secret'):
+            conn.execute("INSERT INTO channels (name, display_name, created_by) VALUES (?, ?, 'bob')", (name, name))
+        conn.execute("INSERT INTO channel_members (channel_id, username) "
+                     "SELECT id, 'alice' FROM channels WHERE name = 'team'")
+        conn.executemany("INSERT INTO messages (username, message, room, recipient) VALUES (?, ?, ?, ?)", [
+            ('bob', 'deploy team release', 'channel_team', None),
+            ('bob', 'deploy secret release', 'channel_secret', None),
+            ('bob', 'deploy for alice <b>', 'private_alice_bob', 'alice'),
+            ('bob', 'deploy for carol', 'private_bob_carol', 'carol'),
+        ])
+    conn.close()
+
+
+def search(client, query, **params):
+    params['q'] = query
+    return client.get('/search_messages', query_string=params).get_json()
+
+
+def test_only_visible_rooms_are_searched(client, rooms):
+    results = search(client, 'deploy')['results']
+    assert sorted(r['room'] for r in results) == ['channel_team', 'private_alice_bob']
+
+
+def test_room_filter_cannot_widen_scope(client, rooms):
+    assert search(client, 'deploy', room='channel_team')['results'][0]['room'] == 'channel_team'
+    assert search(client, 'deploy', room='channel_secret')['results'] == []
+    assert search(client, 'deploy', room='private_bob_carol')['results'] == []
+
+
+def test_snippet_is_escaped_and_highlighted(client, rooms):
+    [result] = search(client, 'alic', room='private_alice_bob')['results']
+    assert '<mark>alice</mark>' in result['snippet']
+    assert '&lt;b&gt;' in result['snippet']
+
+
+def test_recency_pages_by_before_id(client, rooms):
+    first = search(client, 'deploy', limit=1, before_id=10 ** 9)
+    assert len(first['results']) == 1
+    rest = search(client, 'deploy', limit=1, before_id=first['next_before_id'])['results']
+    assert rest[0]['id'] < first['results'][0]['id']
@@ -0,0 +1,110 @@
+import errno
+import fcntl
+import io
+import os
+
+import pytest
+
+from uploads import ChunkedUploads, UploadError
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return ChunkedUploads(str(tmp_path / 'uploads_tmp'), max_size=100, chunk_size=10)
+
+
+def test_resume_from_reported_offset(uploads, tmp_path):
+    upload = uploads.create('alice', 'notes.txt', 10)
+    assert upload['offset'] == 0
+    assert uploads.receive(upload['upload_id'], 'alice', 0, io.BytesIO(b'hello'))['offset'] == 5
+    # После обрыва клиент спрашивает, с какого места продолжать
+    assert uploads.status(upload['upload_id'], 'alice')['offset'] == 5
+    assert uploads.receive(upload['upload_id'], 'alice', 5, io.BytesIO(b'world'))['offset'] == 10
+    target = str(tmp_path / 'notes.txt')
+    assert uploads.finalize(upload['upload_id'], 'alice', lambda meta: target) == target
+    with open(target, 'rb') as f:
+        assert f.read() == b'helloworld'
+    with pytest.raises(UploadError) as error:
+        uploads.status(upload['upload_id'], 'alice')
+    assert error.value.status == 404
+
+
+
+def test_finalize_moves_across_filesystems(uploads, tmp_path, monkeypatch):
+    # Временная папка загрузок и хранилище на разных дисках: rename и replace дают EXDEV
+    def rename(src, dst):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+    monkeypatch.setattr(os, 'rename', rename)
+    monkeypatch.setattr(os, 'replace', rename)
+    upload_id = uploads.create('alice', 'a.bin', 3)['upload_id']
+    uploads.receive(upload_id, 'alice', 0, io.BytesIO(b'abc'))
+    target = str(tmp_path / 'a.bin')
+    assert uploads.finalize(upload_id, 'alice', lambda meta: target) == target
+    with open(target, 'rb') as f:
+        assert f.read() == b'abc'
+    assert os.listdir(uploads.folder) == []
+
+@pytest.mark.parametrize('offset', [0, 3, 7])
+def test_wrong_offset_is_409_with_current_offset(uploads, offset):
+    upload_id = uploads.create('alice', 'a.bin', 10)['upload_id']
+    uploads.receive(upload_id, 'alice', 0, io.BytesIO(b'12345'))
+    with pytest.raises(UploadError) as error:
+        uploads.receive(upload_id, 'alice', offset, io.BytesIO(b'67890'))
+    assert (error.value.status, error.value.offset) == (409, 5)
+    assert uploads.status(upload_id, 'alice')['offset'] == 5
+
+
+def test_chunk_in_progress_is_409(uploads):
+    upload_id = uploads.create('alice', 'a.bin', 10)['upload_id']
+    part = os.path.join(uploads.folder, upload_id + '.part')
+    with open(part, 'ab') as f:
+        # Предыдущий PUT еще пишет часть
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        with pytest.raises(UploadError) as error:
+            uploads.receive(upload_id, 'alice', 0, io.BytesIO(b'12345'))
+        assert error.value.status == 409
+        with pytest.raises(UploadError):
+            uploads.finalize(upload_id, 'alice', lambda meta: part + '.done')
+    assert os.path.getsize(part) == 0
+
+
+def test_more_data_than_declared_is_413(uploads):
+    upload_id = uploads.create('alice', 'a.bin', 4)['upload_id']
+    with pytest.raises(UploadError) as error:
+        uploads.receive(upload_id, 'alice', 0, io.BytesIO(b'12345'))
+    assert error.value.status == 413
+
+
+def test_finalize_incomplete_is_409(uploads, tmp_path):
+    upload_id = uploads.create('alice', 'a.bin', 10)['upload_id']
+    uploads.receive(upload_id, 'alice', 0, io.BytesIO(b'123'))
+    with pytest.raises(UploadError) as error:
+        uploads.finalize(upload_id, 'alice', lambda meta: str(tmp_path / 'a.bin'))
+    assert (error.value.status, error.value.offset) == (409, 3)
+
+
+@pytest.mark.parametrize('filename, size, status', [
+    ('', 10, 400),
+    ('a.bin', 0, 400),
+    ('a.bin', '10', 400),
+    ('a.bin', 101, 413),
+])
+def test_create_validates(uploads, filename, size, status):
+    with pytest.raises(UploadError) as error:
+        uploads.create('alice', filename, size)
+    assert error.value.status == status
+
+
+@pytest.mark.parametrize('upload_id', ['../etc/passwd', 'abc', 'f' * 32])
+def test_unknown_or_malformed_id_is_404(uploads, upload_id):
+    with pytest.raises(UploadError) as error:
+        uploads.status(upload_id, 'alice')
+    assert error.value.status == 404
+
+
+def test_other_owner_cannot_see_upload(uploads):
+    upload_id = uploads.create('alice', 'a.bin', 10)['upload_id']
+    with pytest.raises(UploadError) as error:
+        uploads.receive(upload_id, 'bob', 0, io.BytesIO(b'1'))
+    assert error.value.status == 404
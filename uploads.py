@@ -0,0 +1,158 @@
+# uploads.py - загрузка файлов частями с докачкой для AURA Messenger
+#
+# Протокол:
+#   POST /uploads                    {filename, size, purpose} -> {upload_id, offset, chunk_size}
+#   GET  /uploads/<id>               -> {offset, size}: с какого места продолжать после обрыва
+#   PUT  /uploads/<id>?offset=N      тело - байты части, пишутся на диск потоком
+#   POST /uploads/<id>/finalize      -> файл переносится в папку назначения
+#
+# Состояние загрузки - это файлы <id>.part и <id>.json во временной папке,
+# поэтому докачка переживает рестарт и работает с любым воркером этой машины.
+# Пока часть записывается, .part заблокирован (flock): повтор PUT, пришедший до
+# конца предыдущего, получает 409, а не дописывает байты вперемешку.
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+
+from concurrency import run_blocking
+
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploads:
+    def __init__(self, folder, max_size=512 * 1024 * 1024, chunk_size=4 * 1024 * 1024, ttl=24 * 3600,
+                 read_size=64 * 1024):
+        self.folder = folder
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.read_size = read_size  # столько байт тела держим в памяти за раз
+        self._next_sweep = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _paths(self, upload_id):
+        if not UPLOAD_ID.match(upload_id or ''):
+            raise UploadError('Загрузка не найдена', 404)
+        base = os.path.join(self.folder, upload_id)
+        return base + '.part', base + '.json'
+
+    def _lock(self, f, offset):
+        # Эксклюзивная блокировка части до закрытия файла, без ожидания
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Часть уже принимается', 409, offset)
+
+    def _load(self, upload_id, owner):
+        part, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError('Загрузка не найдена', 404)
+        if meta['owner'] != owner:
+            raise UploadError('Загрузка не найдена', 404)
+        meta['offset'] = os.path.getsize(part) if os.path.exists(part) else 0
+        return meta
+
+    def _sweep(self):
+        # Брошенные загрузки удаляются не чаще раза в десять минут
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + 600
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _create(self, owner, filename, size, purpose):
+        self._sweep()
+        upload_id = os.urandom(16).hex()
+        part, meta_path = self._paths(upload_id)
+        open(part, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'owner': owner, 'filename': filename, 'size': size, 'purpose': purpose,
+                       'created_at': time.time()}, f)
+        return upload_id
+
+    def create(self, owner, filename, size, purpose='file'):
+        if not filename:
+            raise UploadError('Файл не выбран')
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('Неверный размер файла')
+        if size > self.max_size:
+            raise UploadError('Файл слишком большой', 413)
+        upload_id = run_blocking(self._create, owner, filename, size, purpose)
+        return {'upload_id': upload_id, 'offset': 0, 'size': size, 'chunk_size': self.chunk_size}
+
+    def status(self, upload_id, owner):
+        meta = run_blocking(self._load, upload_id, owner)
+        return {'upload_id': upload_id, 'offset': meta['offset'], 'size': meta['size'],
+                'chunk_size': self.chunk_size}
+
+    def receive(self, upload_id, owner, offset, stream):
+        # Часть принимается только с текущего конца файла: повтор уже записанной
+        # части или дыра отклоняются с актуальным offset, и клиент продолжает с него
+        meta = run_blocking(self._load, upload_id, owner)
+        if offset != meta['offset']:
+            raise UploadError('Неверное смещение', 409, meta['offset'])
+        part, _ = self._paths(upload_id)
+        f = run_blocking(open, part, 'ab')
+        try:
+            self._lock(f, meta['offset'])
+            # Под блокировкой размер уже не изменится: проверяем смещение еще раз
+            written = os.fstat(f.fileno()).st_size
+            if offset != written:
+                raise UploadError('Неверное смещение', 409, written)
+            while True:
+                # Чтение из сокета - в текущем потоке/гринлете, запись на диск - в пуле
+                data = stream.read(self.read_size)
+                if not data:
+                    break
+                if written + len(data) > meta['size']:
+                    raise UploadError('Данных больше, чем объявлено', 413, written)
+                run_blocking(f.write, data)
+                written += len(data)
+        finally:
+            run_blocking(f.close)
+        return {'upload_id': upload_id, 'offset': written, 'size': meta['size']}
+
+    def _finalize(self, upload_id, owner, path):
+        meta = self._load(upload_id, owner)
+        if meta['offset'] != meta['size']:
+            raise UploadError('Загрузка не завершена', 409, meta['offset'])
+        part, meta_path = self._paths(upload_id)
+        with open(part, 'rb') as f:
+            self._lock(f, meta['offset'])
+            shutil.move(part, path)  # папка назначения может быть на другом диске
+        os.remove(meta_path)
+
+    def finalize(self, upload_id, owner, destination):
+        # destination(meta) -> путь на диске, куда переносится собранный файл
+        meta = run_blocking(self._load, upload_id, owner)
+        path = destination(meta)
+        run_blocking(self._finalize, upload_id, owner, path)
+        return path
+
+    def _discard(self, upload_id, owner):
+        self._load(upload_id, owner)
+        for path in self._paths(upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def discard(self, upload_id, owner):
+        run_blocking(self._discard, upload_id, owner)
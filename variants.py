@@ -0,0 +1,142 @@
+# variants.py - уменьшенные копии изображений (превью, WebP, аватары) для AURA Messenger
+#
+# После загрузки изображения в хранилище media его варианты строятся в пуле
+# процессов: ресайз и кодирование в WebP упираются в CPU и держат GIL, поэтому в
+# потоках они тормозили бы обработку запросов. Файл варианта лежит рядом с
+# оригиналом (ab/cd/<hash>.<вариант>.webp), а строка в media_variants сообщает
+# обработчикам, что его можно отдавать. Пока варианта нет, клиент получает оригинал.
+#
+# Нужен пакет Pillow; без него конвейер выключен и везде отдаются оригиналы.
+import atexit
+import concurrent.futures
+import multiprocessing
+import os
+
+from concurrency import run_blocking
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif', 'webp')
+
+# Вариант: (сторона в пикселях, 'fit' - вписать с сохранением пропорций, 'crop' - квадрат)
+VARIANTS = {
+    'thumb': (320, 'fit'),  # превью в сообщениях и избранном
+    'large': (1280, 'fit'),  # просмотр в полный экран
+    'avatar': (256, 'crop'),  # аватар в профиле и шапке чата
+    'avatar_small': (96, 'crop'),  # аватар в списках и сообщениях (40-48px на экранах 2x)
+}
+PROFILES = {
+    'image': ('thumb', 'large'),
+    'avatar': ('avatar', 'avatar_small'),
+}
+WEBP_QUALITY = 80
+
+
+def pool_process():
+    # True в процессе пула: spawn заново импортирует в нем главный модуль (как
+    # __mp_main__), и приложение не должно создаваться там второй раз. Имя процесса
+    # выставляется до импорта главного модуля; воркеры gunicorn (fork) остаются MainProcess
+    return multiprocessing.current_process().name != 'MainProcess'
+
+
+def render(source, targets):
+    # Выполняется в процессе пула: targets - [(вариант, путь), ...];
+    # возвращает [(вариант, ширина, высота, размер), ...]
+    results = []
+    with Image.open(source) as original:
+        animated = getattr(original, 'is_animated', False)
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        for name, target in targets:
+            side, mode = VARIANTS[name]
+            if name == 'large' and animated:
+                continue  # полноразмерная копия потеряла бы анимацию - отдаем оригинал
+            if mode == 'crop':
+                variant = ImageOps.fit(image, (side, side), Image.LANCZOS)
+            else:
+                variant = image.copy()
+                variant.thumbnail((side, side), Image.LANCZOS)
+            temp = f'{target}.{os.getpid()}.tmp'
+            variant.save(temp, 'WEBP', quality=WEBP_QUALITY, method=4)
+            os.replace(temp, target)
+            results.append((name, variant.width, variant.height, os.path.getsize(target)))
+    return results
+
+
+class VariantPipeline:
+    def __init__(self, media, registry, workers=2, max_pending=200):
+        self.media = media
+        self.registry = registry  # storage.media: существующие варианты и запись новых
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.generated = 0
+        self.failed = 0
+        self.dropped = 0
+        self._executor = None
+        self._pid = None
+
+    def available(self):
+        return Image is not None and self.workers > 0
+
+    def _pool(self):
+        # Пул создается лениво и заново в каждом воркере после fork; spawn, а не fork:
+        # процесс приложения держит потоки tpool и соединения с БД
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'))
+            # Без явной остановки процесс под eventlet зависает на выходе, ожидая процессы пула
+            atexit.register(self._executor.shutdown)
+        return self._executor
+
+    def submit(self, url, profile='image', on_ready=None):
+        # Вызывается из гринлета/потока запроса, не из tpool. on_ready() - после записи
+        # вариантов в БД, чтобы сбросить кэши с путями
+        if not self.available() or not url or url.rsplit('.', 1)[-1].lower() not in IMAGE_EXTENSIONS:
+            return False
+        source = self.media.path_for(url)
+        if source is None:
+            return False  # старые папки static/uploads и т.д. не обрабатываются
+        existing = run_blocking(self.registry.variants, [url]).get(url, {})
+        targets = [(name, self.media.variant_path(url, name)) for name in PROFILES[profile] if name not in existing]
+        if not targets:
+            return False
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            return False
+        self.pending += 1
+        future = self._pool().submit(render, source, [(name, path) for name, (path, _) in targets])
+        future.add_done_callback(lambda f: self._done(url, dict(targets), f, on_ready))
+        return True
+
+    def _done(self, url, targets, future, on_ready):
+        self.pending -= 1
+        try:
+            rendered = future.result()
+            run_blocking(self.registry.add_variants, url,
+                         [(name, targets[name][1], width, height, size) for name, width, height, size in rendered])
+        except Exception as e:
+            print(f"Error rendering variants for {url}: {e}")
+            self.failed += 1
+            return
+        self.generated += len(rendered)
+        if on_ready is not None:
+            try:
+                on_ready()
+            except Exception as e:
+                print(f"Error after rendering variants: {e}")
+
+    def stats(self):
+        return {
+            'available': self.available(),
+            'workers': self.workers,
+            'pending': self.pending,
+            'generated': self.generated,
+            'failed': self.failed,
+            'dropped': self.dropped,
+        }